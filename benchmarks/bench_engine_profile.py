@@ -0,0 +1,114 @@
+####################################################################
+#
+# Cold and warm query latency with the default engines and with the
+# read-only profile of utilities/db.py (create_readonly_engine +
+# warm_up), on the SQLite databases behind config.engines or on
+# synthetic ones (see synthetic.py).
+#
+#    python -m submodules.benchmarks.bench_engine_profile [OUT_DIR data_rows lib_rows] [repeat]
+#
+# "cold" is the first call on a new engine: connection set-up, pragmas
+# and an empty SQLite page cache. For the profile it includes warm_up(),
+# which the profile pays at startup instead. The OS page cache is not
+# dropped.
+#
+####################################################################
+
+import sys
+import time
+import statistics
+from sqlalchemy import create_engine
+
+from . import synthetic
+from .bench_queries import _store
+from ..exfor import queries as exfor_queries
+from ..endflibs import queries as lib_queries
+from ..utilities.db import sqlite_file, create_readonly_engine, warm_up
+
+
+def cases(elem="U", mass="235") -> list:
+    xs = _store("XS", "n,g", elem, mass, mt="102")
+    entids = list(exfor_queries.exfor_index_query(xs))
+    ids = list(lib_queries.lib_index_query(xs))
+    return [
+        ("exfor_index_query", lambda: exfor_queries.exfor_index_query(xs)),
+        ("entries_query", lambda: exfor_queries.entries_query(target_elem=elem, target_mass=mass)),
+        ("data_query", lambda: exfor_queries.data_query(xs, entids)),
+        ("lib_index_query", lambda: lib_queries.lib_index_query(xs)),
+        ("lib_data_query", lambda: lib_queries.lib_data_query(xs, ids)),
+    ]
+
+
+def _use(engines: dict):
+    for name, engine in engines.items():
+        exfor_queries.engines[name] = engine
+        lib_queries.engines[name] = engine
+
+
+def _measure(make_engines, calls, repeat, warm=None) -> dict:
+    """
+    label -> (cold ms, warm p50 ms) with fresh engines from make_engines();
+    the cold time includes warm(engine) when given.
+    """
+    results = {}
+    for label, call in calls:
+        engines = make_engines()
+        _use(engines)
+
+        start = time.perf_counter()
+        if warm:
+            for engine in engines.values():
+                warm(engine)
+        call()
+        cold = (time.perf_counter() - start) * 1e3
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - start)
+        results[label] = (cold, statistics.median(timings) * 1e3)
+
+        for engine in engines.values():
+            engine.dispose()
+    return results
+
+
+def run(paths: dict, repeat=20):
+    # measure the database round trips, not the lookup cache in front of them
+    lib_queries.USE_LOOKUP_CACHE = False
+    lib_queries.clear_lookup_cache()
+
+    calls = cases()
+
+    default = _measure(
+        lambda: {name: create_engine(f"sqlite:///{path}") for name, path in paths.items()},
+        calls,
+        repeat,
+    )
+    profiled = _measure(
+        lambda: {name: create_readonly_engine(path, name) for name, path in paths.items()},
+        calls,
+        repeat,
+        warm=warm_up,
+    )
+
+    print(f"{'query':<20} {'cold default':>13} {'cold profile':>13} {'warm default':>13} {'warm profile':>13}")
+    for label, _ in calls:
+        cold_d, warm_d = default[label]
+        cold_p, warm_p = profiled[label]
+        print(f"{label:<20} {cold_d:11.2f}ms {cold_p:11.2f}ms {warm_d:11.2f}ms {warm_p:11.2f}ms")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) >= 3:
+        paths = synthetic.build(args[0], int(args[1]), int(args[2]))
+        repeat = int(args[3]) if len(args) > 3 else 20
+    else:
+        paths = {name: sqlite_file(exfor_queries.engines[name]) for name in ("exfor", "endftables")}
+        if None in paths.values():
+            sys.exit("config.engines are not SQLite files, give OUT_DIR data_rows lib_rows")
+        repeat = int(args[0]) if args else 20
+    _use({name: create_engine(f"sqlite:///{path}") for name, path in paths.items()})
+    run(paths, repeat)
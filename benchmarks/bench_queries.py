@@ -0,0 +1,143 @@
+####################################################################
+#
+# Latency and memory of the public query functions on synthetic
+# databases (see synthetic.py), for heavy, medium and light targets.
+#
+# Run from the application root; the databases are generated in OUT_DIR
+# on the first run and reused afterwards:
+#
+#    python -m submodules.benchmarks.bench_queries OUT_DIR [data_rows] [lib_rows] [repeat]
+#
+# config.engines is pointed at the synthetic databases for the run.
+#
+####################################################################
+
+import sys
+import time
+import resource
+import statistics
+import tracemalloc
+from sqlalchemy import create_engine
+
+from . import synthetic
+from ..exfor import queries as exfor_queries
+from ..endflibs import queries as lib_queries
+from ..utilities.instrument import instrument_engine
+
+
+# (elem, mass) of a heavily measured, a medium and a rarely measured target
+TARGETS = [("U", "235"), ("Fe", "56"), ("Ni", "58")]
+
+
+def use_databases(paths: dict):
+    """Point the engines used by the query modules at the given SQLite files."""
+    for name, path in paths.items():
+        engine = create_engine(f"sqlite:///{path}")
+        instrument_engine(engine)
+        exfor_queries.engines[name] = engine
+        lib_queries.engines[name] = engine
+
+
+def _store(obs_type, reaction, elem, mass, **extra):
+    return {
+        "obs_type": obs_type,
+        "reaction": reaction,
+        "target_elem": elem,
+        "target_mass": mass,
+        "inc_pt": reaction.split(",")[0],
+        **extra,
+    }
+
+
+def cases() -> list:
+    """(label, callable) pairs, one per query function and target."""
+    out = []
+    for elem, mass in TARGETS:
+        label = f"{elem}-{mass}"
+        xs = _store("XS", "n,g", elem, mass, mt="102")
+        da = _store("DA", "n,el", elem, mass, mt="2")
+        entids = list(exfor_queries.exfor_index_query(xs))
+        ids = list(lib_queries.lib_index_query(xs))
+
+        out += [
+            (f"entries_query {label}", lambda e=elem, m=mass: exfor_queries.entries_query(target_elem=e, target_mass=m)),
+            (f"exfor_index_query XS {label}", lambda s=xs: exfor_queries.exfor_index_query(s)),
+            (f"exfor_index_query DA {label}", lambda s=da: exfor_queries.exfor_index_query(s)),
+            (f"data_query XS {label}", lambda s=xs, i=entids: exfor_queries.data_query(s, i)),
+            (f"lib_index_query XS {label}", lambda s=xs: lib_queries.lib_index_query(s)),
+            (f"lib_data_query XS {label}", lambda s=xs, i=ids: lib_queries.lib_data_query(s, i)),
+            (
+                f"get_reaction_list XS {label}",
+                lambda e=elem, m=mass: lib_queries.get_reaction_list(
+                    {"obs_type": "XS", "target": [lib_queries.libstyle_nuclide_expression(e, m)]}
+                ),
+            ),
+            (
+                f"resonancetable_index_query {label}",
+                lambda e=elem, m=mass: lib_queries.resonancetable_index_query(
+                    {"target_elem": e, "target_mass": m, "obs_type": "macs"}
+                ),
+            ),
+        ]
+
+    out += [
+        ("entries_query first_author", lambda: exfor_queries.entries_query(first_author="Okumura")),
+        ("join_reaction_bib page", lambda: exfor_queries.join_reaction_bib(page_size=100)),
+        ("join_index_bib page", lambda: exfor_queries.join_index_bib(page_size=100)),
+        (
+            "join_index_bib filtered",
+            lambda: exfor_queries.join_index_bib(page_size=100, filters=[("sf6", "==", "SIG")]),
+        ),
+        ("join_reaction_bib all", exfor_queries.join_reaction_bib),
+        ("join_index_bib all", exfor_queries.join_index_bib),
+    ]
+    return out
+
+
+def _rows(result):
+    if isinstance(result, tuple):
+        result = result[-1]
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def run(repeat=20):
+    # measure the database round trips, not the lookup cache in front of them
+    lib_queries.USE_LOOKUP_CACHE = False
+    lib_queries.clear_lookup_cache()
+
+    print(f"{'query':<40} {'rows':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}")
+    for label, call in cases():
+        # one traced call for the memory peak, then the timed calls
+        tracemalloc.start()
+        rows = _rows(call())
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        p50 = statistics.median(timings) * 1e3
+        p95 = timings[int(0.95 * (len(timings) - 1))] * 1e3
+        p99 = timings[int(0.99 * (len(timings) - 1))] * 1e3
+        print(f"{label:<40} {rows if rows is not None else '-':>8} {p50:9.2f} {p95:9.2f} {p99:9.2f} {peak:8.1f}")
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"max RSS {max_rss:.0f} MB")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        sys.exit(
+            "usage: python -m submodules.benchmarks.bench_queries OUT_DIR [data_rows] [lib_rows] [repeat]"
+        )
+    sizes = [int(arg) for arg in args[1:3]]
+    use_databases(synthetic.build(args[0], *sizes))
+    run(int(args[3]) if len(args) > 3 else 20)
@@ -0,0 +1,76 @@
+####################################################################
+#
+# Benchmark of the compiled statement cache (utilities/db.execute_cached)
+# used by exfor_index_query and lib_index_query, against building and
+# compiling a new select() on every call.
+#
+# Run from the application root, with config.engines pointing at the
+# exfor and endftables databases:
+#
+#    python -m submodules.benchmarks.bench_statement_cache [repeat]
+#
+####################################################################
+
+import sys
+import time
+import statistics
+
+from ..exfor import queries as exfor_queries
+from ..endflibs import queries as lib_queries
+from ..utilities.db import statement_cache_stats
+
+
+INPUT_STORES = [
+    {"obs_type": "XS", "reaction": "n,g", "target_elem": "Au", "target_mass": "197", "inc_pt": "n", "mt": "102"},
+    {"obs_type": "XS", "reaction": "n,f", "target_elem": "U", "target_mass": "235", "inc_pt": "n", "mt": "18", "excl_junk_switch": True},
+    {"obs_type": "XS", "reaction": "n,inl", "target_elem": "Fe", "target_mass": "56", "inc_pt": "n", "level_num": 1, "mt": "51"},
+    {"obs_type": "FY", "reaction": "n,f", "target_elem": "U", "target_mass": "235", "inc_pt": "n", "branch": "CUM", "mt": "454"},
+    {"obs_type": "DA", "reaction": "n,el", "target_elem": "Fe", "target_mass": "56", "inc_pt": "n", "mt": "2"},
+    {"obs_type": "RP", "reaction": "p,x", "target_elem": "Cu", "target_mass": "63", "inc_pt": "p", "rp_elem": "Zn", "rp_mass": "63"},
+    {"obs_type": "MACS", "reaction": "n,g", "target_elem": "Au", "target_mass": "197", "inc_pt": "n", "excl_junk_switch": True},
+]
+
+
+def _time_calls(func, stores, repeat):
+    timings = []
+    for _ in range(repeat):
+        for input_store in stores:
+            start = time.perf_counter()
+            func(input_store)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(label, timings):
+    timings = sorted(timings)
+    p50 = statistics.median(timings) * 1e6
+    p95 = timings[int(0.95 * (len(timings) - 1))] * 1e6
+    print(f"{label:<36} p50 {p50:9.1f} us   p95 {p95:9.1f} us   n={len(timings)}")
+    return p50
+
+
+def run(repeat=200):
+    # measure the database round trips, not the lookup cache in front of them
+    lib_queries.USE_LOOKUP_CACHE = False
+    lib_queries.clear_lookup_cache()
+
+    for label, module, func in (
+        ("exfor_index_query", exfor_queries, exfor_queries.exfor_index_query),
+        ("lib_index_query", lib_queries, lib_queries.lib_index_query),
+    ):
+        # warm up both paths (connection pool, SQLAlchemy's own compiled cache)
+        for flag in (False, True):
+            module.USE_STATEMENT_CACHE = flag
+            _time_calls(func, INPUT_STORES, 2)
+
+        module.USE_STATEMENT_CACHE = False
+        before = _report(f"{label} (select per call)", _time_calls(func, INPUT_STORES, repeat))
+        module.USE_STATEMENT_CACHE = True
+        after = _report(f"{label} (statement cache)", _time_calls(func, INPUT_STORES, repeat))
+        print(f"{'':<36} speed-up x{before / after:.2f}")
+
+    print("statement cache:", statement_cache_stats())
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
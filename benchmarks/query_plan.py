@@ -0,0 +1,238 @@
+####################################################################
+#
+# Query plans of the statements sent by exfor_index_query,
+# entries_query, data_query, lib_index_query and lib_data_query, with
+# the indexes they need.
+#
+# For every obs_type of EXFOR_OBS_TYPE_CONFIG and LIB_OBS_TYPE_CONFIG a
+# representative statement is built with the same code the query
+# functions use and explained (EXPLAIN QUERY PLAN on SQLite, EXPLAIN
+# elsewhere). Full table scans and temporary B-trees are flagged, and
+# the recommended indexes missing from the databases are listed.
+#
+# With --apply COPY_DIR the SQLite databases are copied to COPY_DIR, the
+# missing indexes are created on the copies (never on the originals),
+# and plans and timings are reported before and after.
+#
+#    python -m submodules.benchmarks.query_plan [--apply COPY_DIR] [--verbose]
+#
+####################################################################
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import statistics
+from sqlalchemy import create_engine, inspect, select
+
+from ..exfor import queries as exfor_queries
+from ..endflibs import queries as lib_queries
+from ..utilities.db import sqlite_file
+
+
+# (database, table, columns) the query functions rely on
+RECOMMENDED_INDEXES = [
+    ("exfor", "exfor_indexes", ("target", "projectile", "sf6", "process")),
+    ("exfor", "exfor_indexes", ("entry_id",)),
+    ("exfor", "exfor_reactions", ("entry_id",)),
+    ("exfor", "exfor_reactions", ("target",)),
+    ("exfor", "exfor_reactions", ("entry",)),
+    ("exfor", "exfor_data", ("entry_id",)),
+    ("exfor", "exfor_bib", ("entry",)),
+    ("endftables", "endf_reactions", ("target", "projectile", "obs_type")),
+    ("endftables", "endf_xs_data", ("reaction_id",)),
+    ("endftables", "endf_angle_data", ("reaction_id",)),
+    ("endftables", "endf_residual_data", ("reaction_id",)),
+    ("endftables", "endf_n_residual_data", ("reaction_id",)),
+    ("endftables", "endf_fy_data", ("reaction_id",)),
+    ("endftables", "resonancetable_data", ("reaction_id",)),
+]
+
+# Sample page inputs per obs_type for the statements to explain
+SAMPLE_REACTIONS = {
+    "XS": {"reaction": "n,g", "mt": "102"},
+    "TH": {"reaction": "n,g", "mt": "102"},
+    "RI": {"reaction": "n,g", "mt": "102"},
+    "RP": {"reaction": "p,x", "rp_elem": "Np", "rp_mass": "235"},
+    "FY": {"reaction": "n,f", "branch": "CUM", "mt": "459"},
+    "DA": {"reaction": "n,el", "mt": "2"},
+    "DE": {"reaction": "n,n"},
+    "MACS": {"reaction": "n,g"},
+    "GG": {"reaction": "n,0"},
+    "D": {"reaction": "n,0"},
+}
+
+TIMING_REPEAT = 5
+
+
+def _store(obs_type, elem, mass):
+    reaction = SAMPLE_REACTIONS.get(obs_type, {"reaction": "n,g"})
+    return {
+        "obs_type": obs_type,
+        "target_elem": elem,
+        "target_mass": mass,
+        "inc_pt": reaction["reaction"].split(",")[0],
+        "excl_junk_switch": True,
+        **reaction,
+    }
+
+
+def statements(elem="U", mass="235") -> list:
+    """(database, label, statement) built like the query functions build them."""
+    out = []
+    for obs_type in exfor_queries.EXFOR_OBS_TYPE_CONFIG:
+        conditions = exfor_queries._exfor_index_conditions(_store(obs_type, elem, mass))
+        out.append(("exfor", f"exfor_index_query {obs_type}", exfor_queries._select_indexes(conditions)))
+
+    out.append(("exfor", "entries_query target", exfor_queries._entries_stmt(target_elem=elem, target_mass=mass)))
+    out.append(("exfor", "entries_query element", exfor_queries._entries_stmt(target_elem=elem, types=["SIG"])))
+
+    xs = _store("XS", elem, mass)
+    entids = list(exfor_queries.exfor_index_query(xs))
+    out.append(("exfor", "data_query XS", exfor_queries._data_query_stmt(xs, entids)))
+
+    for obs_type, config in lib_queries.LIB_OBS_TYPE_CONFIG.items():
+        conditions = lib_queries._lib_index_conditions(_store(obs_type, elem, mass))
+        if conditions is not None and config["db_obs_type"] is not None:
+            out.append(("endftables", f"lib_index_query {obs_type}", lib_queries._select_lib_reactions(conditions)))
+
+    ids = list(lib_queries.lib_index_query(xs)) or [0]
+    out.append(
+        ("endftables", "lib_data_query XS", select(lib_queries.endf_xs_data).where(lib_queries.endf_xs_data.c.reaction_id.in_(ids)))
+    )
+    return out
+
+
+def _compile(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return str(compiled), params
+
+
+def explain(conn, stmt) -> tuple[list, list]:
+    """Plan lines and flags ("full scan <table>", "temp b-tree ...") of stmt."""
+    sql, params = _compile(conn, stmt)
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        lines = [row[-1] for row in rows]
+    else:
+        rows = conn.exec_driver_sql("EXPLAIN " + sql, params).fetchall()
+        lines = [" ".join(str(value) for value in row) for row in rows]
+
+    flags = []
+    for line in lines:
+        scan = re.match(r"SCAN (?:TABLE )?(\w+)(.*)", line)
+        if scan and "INDEX" not in scan.group(2):
+            flags.append(f"full scan {scan.group(1)}")
+        elif "USE TEMP B-TREE" in line:
+            flags.append("temp b-tree " + line.split("FOR ", 1)[-1].lower())
+        elif "Seq Scan on" in line:
+            flags.append("full scan " + line.split("Seq Scan on ", 1)[1].split()[0])
+    return lines, flags
+
+
+def time_statement(conn, stmt, repeat=TIMING_REPEAT) -> float:
+    """Median execution time of stmt in ms, rows fetched."""
+    sql, params = _compile(conn, stmt)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.exec_driver_sql(sql, params).fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e3
+
+
+def missing_indexes(engine, database) -> list:
+    """Recommended (table, columns) of database not covered by an index prefix or the primary key."""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for db, table, columns in RECOMMENDED_INDEXES:
+        if db != database or table not in tables:
+            continue
+        existing = [tuple(index["column_names"]) for index in inspector.get_indexes(table)]
+        existing.append(tuple(inspector.get_pk_constraint(table)["constrained_columns"]))
+        if not any(index[: len(columns)] == columns for index in existing):
+            missing.append((table, columns))
+    return missing
+
+
+def create_index_sql(table, columns) -> str:
+    return f"CREATE INDEX IF NOT EXISTS ix_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+
+
+def analyse(engines, stmts, verbose=False) -> dict:
+    """Explain and time every statement, print the flags; returns label -> (flags, ms)."""
+    results = {}
+    for database, label, stmt in stmts:
+        with engines[database].connect() as conn:
+            lines, flags = explain(conn, stmt)
+            ms = time_statement(conn, stmt)
+        results[label] = (flags, ms)
+        print(f"{label:<30} {ms:9.2f} ms   {'; '.join(flags) or 'ok'}")
+        if verbose:
+            for line in lines:
+                print(f"{'':<32}{line}")
+    return results
+
+
+def copy_sqlite(path, out_dir) -> str:
+    """Consistent copy of a SQLite database through the backup API."""
+    os.makedirs(out_dir, exist_ok=True)
+    target = os.path.join(out_dir, os.path.basename(path))
+    src, dst = sqlite3.connect(f"file:{path}?mode=ro", uri=True), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+    return target
+
+
+def run(apply_dir=None, verbose=False):
+    engines = {name: exfor_queries.engines[name] for name in ("exfor", "endftables")}
+    stmts = statements()
+
+    print("== plans ==")
+    before = analyse(engines, stmts, verbose)
+
+    missing = {name: missing_indexes(engine, name) for name, engine in engines.items()}
+    print("\n== missing indexes ==")
+    for name, indexes in missing.items():
+        for table, columns in indexes:
+            print(f"{name}: {create_index_sql(table, columns)};")
+    if not any(missing.values()):
+        print("none")
+
+    if not apply_dir:
+        return
+
+    copies = {}
+    for name, engine in engines.items():
+        path = sqlite_file(engine)
+        if path is None:
+            print(f"{name}: not a SQLite file, indexes not applied")
+            copies[name] = engine
+            continue
+        copies[name] = create_engine(f"sqlite:///{copy_sqlite(path, apply_dir)}")
+        with copies[name].begin() as conn:
+            for table, columns in missing[name]:
+                conn.exec_driver_sql(create_index_sql(table, columns))
+            conn.exec_driver_sql("ANALYZE")
+
+    print(f"\n== plans with the recommended indexes ({apply_dir}) ==")
+    after = analyse(copies, stmts, verbose)
+
+    print("\n== before / after ==")
+    for label, (_, ms_before) in before.items():
+        ms_after = after[label][1]
+        print(f"{label:<30} {ms_before:9.2f} -> {ms_after:9.2f} ms   x{ms_before / ms_after:.2f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    apply_dir = args[args.index("--apply") + 1] if "--apply" in args else None
+    run(apply_dir=apply_dir, verbose="--verbose" in args)
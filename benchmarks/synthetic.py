@@ -0,0 +1,400 @@
+####################################################################
+#
+# Synthetic exfor and endftables SQLite databases for the benchmarks.
+#
+# The tables are created from the SQLAlchemy metadata of exforparser and
+# endftables_sql, so the schema and its indexes are the real ones; only
+# the rows are made up. Targets follow a Zipf-like distribution with a
+# handful of heavily measured / evaluated nuclides in front (U-235,
+# Fe-56, Au-197, ...), and the number of points per reaction is
+# log-normal, so a few data sets are much larger than the median one.
+#
+#    python -m submodules.benchmarks.synthetic OUT_DIR [data_rows] [lib_rows]
+#
+####################################################################
+
+import os
+import sys
+import numpy as np
+from sqlalchemy import create_engine
+
+from exforparser.sql import models_core as exfor_models
+from endftables_sql.scripts import models_core as lib_models
+
+from ..utilities.elem import ELEMS
+from ..utilities.mass import mass_range
+from ..utilities.util import x4style_nuclide_expression, libstyle_nuclide_expression
+
+
+INSERT_CHUNK = 100_000
+
+# Measured and evaluated most often, in this order
+HEAVY_TARGETS = [
+    ("U", 235), ("U", 238), ("Pu", 239), ("Fe", 56), ("Au", 197),
+    ("C", 12), ("Al", 27), ("Cu", 63), ("Ni", 58), ("Th", 232),
+]
+
+PROJECTILES = {"N": 0.62, "P": 0.18, "A": 0.08, "D": 0.05, "G": 0.07}
+
+PROCESSES = {
+    "N": ["N,G", "N,F", "N,2N", "N,TOT", "N,EL", "N,INL", "N,P", "N,A", "N,0"],
+    "P": ["P,X", "P,N", "P,G", "P,INL"],
+    "A": ["A,N", "A,X", "A,G"],
+    "D": ["D,X", "D,N", "D,P"],
+    "G": ["G,N", "G,X", "G,F"],
+}
+
+# sf6 of the reactions and how often they occur
+SF6 = {"SIG": 0.64, "DA": 0.1, "DE": 0.05, "FY": 0.05, "NU": 0.03, "RI": 0.03, "WID": 0.05, "D": 0.05}
+
+AUTHORS = [
+    "Smith", "Okumura", "Jones", "Kim", "Mueller", "Rossi", "Novak", "Tanaka",
+    "Lee", "Ivanov", "Garcia", "Dupont", "Chen", "Nakamura", "Schmidt", "Otuka",
+]
+INSTITUTES = ["(USALAS)", "(JPNKYU)", "(GERKFK)", "(RUSFEI)", "(BLGGEL)", "(USAORL)", "(CPRCIE)"]
+FACILITY_TYPES = ["(LINAC)", "(VDG)", "(CYCLO)", "(REAC)", "(SYNCH)"]
+
+EVALUATIONS = ["endfb8.1", "jeff3.3", "jendl5.0", "tendl.2023", "cendl3.2", "brond3.1"]
+RESONANCE_SOURCES = ["selected", "mughabghab", "ripl3", "endfb8.1", "jendl5.0", "tendl.2023"]
+RESONANCE_OBS = ["thermal", "macs", "D0", "integral", "S0", "gamgam0"]
+XS_MTS = [1, 2, 4, 16, 18, 102, 103, 107]
+
+
+def nuclides() -> list:
+    """(elem, mass) of the synthetic targets, heavy ones first."""
+    out = list(HEAVY_TARGETS)
+    for z, elem in enumerate(ELEMS[:94], start=1):
+        low, high = int(mass_range[str(z)]["min"]), int(mass_range[str(z)]["max"])
+        middle = (low + high) // 2
+        for mass in (middle - 1, middle, middle + 1):
+            if low <= mass <= high and (elem, mass) not in out:
+                out.append((elem, mass))
+    return out
+
+
+def zipf_choice(rng, n_items, size, skew=1.1):
+    weights = 1.0 / np.arange(1, n_items + 1) ** skew
+    return rng.choice(n_items, size=size, p=weights / weights.sum())
+
+
+def weighted_choice(rng, table: dict, size):
+    keys = np.array(list(table), dtype=object)
+    p = np.array(list(table.values()), dtype=float)
+    return keys[rng.choice(len(keys), size=size, p=p / p.sum())]
+
+
+def _insert(conn, table, columns: dict, n: int):
+    """
+    Bulk insert n rows into table. columns maps column name to a sequence of
+    n values; columns the table does not have are ignored, columns of the
+    table not given are left NULL. NaN floats are stored as NULL.
+    """
+    names = [name for name in columns if name in table.c]
+    values = [
+        columns[name].tolist() if isinstance(columns[name], np.ndarray) else list(columns[name])
+        for name in names
+    ]
+    sql = (
+        f"INSERT INTO {table.name} ({', '.join(names)}) "
+        f"VALUES ({', '.join('?' for _ in names)})"
+    )
+    for start in range(0, n, INSERT_CHUNK):
+        rows = list(zip(*(column[start : start + INSERT_CHUNK] for column in values)))
+        conn.exec_driver_sql(sql, rows)
+
+
+def _points(rng, n, total):
+    """Log-normal points per data set, scaled so that they add up to about total."""
+    points = np.maximum(rng.lognormal(mean=2.8, sigma=1.2, size=n), 1)
+    return np.maximum((points * total / points.sum()).round(), 1).astype(np.int64)
+
+
+def _energies(rng, points, lo, hi):
+    """Sorted log-uniform energies per data set, and their min and max per set."""
+    owner = np.repeat(np.arange(len(points)), points)
+    energy = np.exp(lo[owner] + rng.random(len(owner)) * (hi - lo)[owner])
+    energy = energy[np.lexsort((energy, owner))]
+    starts = np.concatenate(([0], np.cumsum(points)[:-1]))
+    return owner, energy, energy[starts], np.maximum.reduceat(energy, starts)
+
+
+######## -------------------------------------- ########
+#    exfor
+######## -------------------------------------- ########
+
+
+def build_exfor(path, data_rows=1_000_000, seed=0):
+    rng = np.random.default_rng(seed)
+    targets = nuclides()
+
+    # ~2.5 reactions per entry, ~40 points per reaction on average
+    n_reactions = max(data_rows // 40, 10)
+    n_entries = max(int(n_reactions / 2.5), 1)
+
+    entries = np.array([f"{10000 + i}" for i in range(n_entries)], dtype=object)
+    first = rng.choice(AUTHORS, size=n_entries)
+    bib = {
+        "entry": entries,
+        "title": np.full(n_entries, "Synthetic measurement", dtype=object),
+        "first_author": np.array([f"{chr(65 + i % 26)}.{name}" for i, name in enumerate(first)], dtype=object),
+        "authors": np.array(
+            [", ".join(rng.choice(AUTHORS, size=rng.integers(1, 6))) for _ in range(n_entries)],
+            dtype=object,
+        ),
+        "year": rng.integers(1950, 2025, size=n_entries),
+        "main_reference": np.array([f"J,NP/A,{i % 999},{i % 97},1990" for i in range(n_entries)], dtype=object),
+        "main_doi": np.full(n_entries, None, dtype=object),
+        "main_facility_institute": rng.choice(INSTITUTES, size=n_entries),
+        "main_facility_type": rng.choice(FACILITY_TYPES, size=n_entries),
+    }
+
+    # reactions: subentries 002, 003, ... of the entries, skewed targets
+    owner = np.sort(rng.integers(0, n_entries, size=n_reactions))
+    subent = np.ones(n_reactions, dtype=np.int64)
+    same = np.r_[False, owner[1:] == owner[:-1]]
+    for i in np.flatnonzero(same):
+        subent[i] = subent[i - 1] + 1
+    entry_ids = np.array(
+        [f"{entries[o]}-{s + 1:03d}-0" for o, s in zip(owner, subent)], dtype=object
+    )
+
+    target_idx = zipf_choice(rng, len(targets), n_reactions)
+    target = np.array([x4style_nuclide_expression(*targets[i]) for i in target_idx], dtype=object)
+    projectile = weighted_choice(rng, PROJECTILES, n_reactions)
+    process = np.array([PROCESSES[p][rng.integers(len(PROCESSES[p]))] for p in projectile], dtype=object)
+    sf6 = weighted_choice(rng, SF6, n_reactions)
+    sf6[(sf6 == "FY") & (process != "N,F")] = "SIG"
+
+    # product nucleus, some of them isomeric states
+    sf4 = target.copy()
+    isomer = rng.random(n_reactions) < 0.05
+    sf4[isomer] = [f"{t}-M" for t in target[isomer]]
+    sf5 = np.full(n_reactions, None, dtype=object)
+    level_num = np.full(n_reactions, None, dtype=object)
+    inl = process == "N,INL"
+    sf5[inl] = "PAR"
+    level_num[inl] = rng.integers(1, 10, size=inl.sum())
+    fy = sf6 == "FY"
+    sf5[fy] = rng.choice(["IND", "CUM", "PRE", "CHN"], size=fy.sum())
+    residual = np.full(n_reactions, None, dtype=object)
+    rp = np.isin(process, ["P,X", "A,X", "D,X", "G,X"])
+    residual[rp] = [f"{targets[i][0]}-{targets[i][1] - 1}" for i in target_idx[rp]]
+
+    sf8 = np.full(n_reactions, None, dtype=object)
+    macs = (sf6 == "SIG") & (process == "N,G") & (rng.random(n_reactions) < 0.1)
+    sf8[macs] = "MXW"
+    sf8[sf6 == "WID"] = "AV"
+
+    x4_code = np.array(
+        [f"({t}({p},,{s}))" for t, p, s in zip(target, process, sf6)], dtype=object
+    )
+
+    points = _points(rng, n_reactions, data_rows)
+    lo = np.log(rng.uniform(1e-5, 1e6, size=n_reactions))
+    hi = lo + rng.uniform(0.1, 8.0, size=n_reactions)
+    point_owner, en_inc, en_min, en_max = _energies(rng, points, lo, hi)
+
+    reactions = {
+        "entry_id": entry_ids,
+        "entry": entries[owner],
+        "target": target,
+        "projectile": projectile,
+        "process": process,
+        "sf4": sf4,
+        "sf5": sf5,
+        "sf6": sf6,
+        "sf8": sf8,
+        "x4_code": x4_code,
+    }
+    indexes = {
+        **reactions,
+        "residual": residual,
+        "level_num": level_num,
+        "en_inc_min": en_min,
+        "en_inc_max": en_max,
+        "points": points,
+        "arbitrary_data": np.zeros(n_reactions, dtype=bool),
+        "mf": np.where(sf6 == "DA", 4, 3),
+        "mt": np.where(process == "N,G", 102, 1),
+        "main_facility_institute": np.array([v[1:-1] for v in bib["main_facility_institute"][owner]], dtype=object),
+        "main_facility_type": np.array([v[1:-1] for v in bib["main_facility_type"][owner]], dtype=object),
+    }
+
+    n_points = len(point_owner)
+    value = rng.lognormal(mean=0.0, sigma=1.5, size=n_points)
+    point_sf6 = sf6[point_owner]
+    nan = np.full(n_points, np.nan)
+    data = {
+        "entry_id": entry_ids[point_owner],
+        "en_inc": en_inc,
+        "den_inc": en_inc * 0.02,
+        "data": value,
+        "ddata": value * 0.05,
+        "angle": np.where(point_sf6 == "DA", rng.uniform(0, 180, size=n_points), nan),
+        "e_out": np.where(point_sf6 == "DE", rng.uniform(0, 2e7, size=n_points), nan),
+        "charge": np.where(point_sf6 == "FY", rng.integers(30, 65, size=n_points), nan),
+        "mass": np.where(point_sf6 == "FY", rng.integers(75, 160, size=n_points), nan),
+        "level_num": level_num[point_owner],
+        "residual": residual[point_owner],
+    }
+
+    engine = _create(path, exfor_models.metadata)
+    with engine.begin() as conn:
+        _insert(conn, exfor_models.exfor_bib, bib, n_entries)
+        _insert(conn, exfor_models.exfor_reactions, reactions, n_reactions)
+        _insert(conn, exfor_models.exfor_indexes, indexes, n_reactions)
+        _insert(conn, exfor_models.exfor_data, data, n_points)
+    engine.dispose()
+    return {"entries": n_entries, "reactions": n_reactions, "data": n_points}
+
+
+######## -------------------------------------- ########
+#    endftables
+######## -------------------------------------- ########
+
+
+def build_endftables(path, data_rows=1_000_000, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    targets = nuclides()
+
+    rows = []  # (evaluation, target, projectile, process, residual, obs_type, mf, mt, year)
+    for rank, (elem, mass) in enumerate(targets):
+        tgt = libstyle_nuclide_expression(elem, str(mass))
+        # heavy targets are in every library, light ones mostly only in TENDL
+        evaluations = EVALUATIONS if rank < 40 else ["tendl.2023"] + (
+            list(rng.choice(EVALUATIONS[:-1], size=rng.integers(0, 3), replace=False))
+        )
+        fissile = mass > 225
+        for evaluation in evaluations:
+            for mt in XS_MTS:
+                if mt == 18 and not fissile:
+                    continue
+                rows.append((evaluation, tgt, "n", f"N,{mt}", None, "xs", 3, mt, 2020))
+            rows.append((evaluation, tgt, "n", "N,EL", None, "angle", 4, 2, 2020))
+            if fissile:
+                rows.append((evaluation, tgt, "n", "N,F", None, "fy", 8, 454, 2020))
+            for z in range(3):
+                residual = libstyle_nuclide_expression(elem, str(mass - z - 1))
+                rows.append((evaluation, tgt, "p", "P,X", residual, "residual", 6, 5, 2020))
+                rows.append((evaluation, tgt, "n", "N,X", residual, "residual", 6, 5, 2020))
+        for source in RESONANCE_SOURCES:
+            for obs_type in RESONANCE_OBS:
+                rows.append((source, tgt, "n", "g", None, obs_type, None, None, 2018))
+
+    n_reactions = len(rows)
+    columns = list(zip(*rows))
+    reactions = {
+        "reaction_id": np.arange(1, n_reactions + 1),
+        "evaluation": np.array(columns[0], dtype=object),
+        "target": np.array(columns[1], dtype=object),
+        "projectile": np.array(columns[2], dtype=object),
+        "process": np.array(columns[3], dtype=object),
+        "residual": np.array(columns[4], dtype=object),
+        "obs_type": np.array(columns[5], dtype=object),
+        "mf": np.array(columns[6], dtype=object),
+        "mt": np.array(columns[7], dtype=object),
+        "year": np.array(columns[8], dtype=object),
+    }
+    obs_type = reactions["obs_type"]
+    reactions["en_inc"] = np.where(obs_type == "angle", 1.0, np.nan)
+
+    engine = _create(path, lib_models.metadata)
+    counts = {"reactions": n_reactions}
+    with engine.begin() as conn:
+        _insert(conn, lib_models.endf_reactions, reactions, n_reactions)
+
+        shares = {"xs": 0.7, "angle": 0.1, "residual": 0.15, "fy": 0.05}
+        tables = {
+            "xs": lib_models.endf_xs_data,
+            "angle": lib_models.endf_angle_data,
+            "fy": lib_models.endf_fy_data,
+        }
+        for kind, share in shares.items():
+            ids = reactions["reaction_id"][obs_type == kind]
+            if kind == "residual":
+                # proton and neutron residual production live in two tables
+                n_res = reactions["projectile"][obs_type == kind] == "n"
+                parts = [(lib_models.endf_n_residual_data, ids[n_res]), (lib_models.endf_residual_data, ids[~n_res])]
+            else:
+                parts = [(tables[kind], ids)]
+
+            for table, part in parts:
+                if not len(part):
+                    continue
+                points = _points(rng, len(part), data_rows * share / len(parts))
+                lo = np.full(len(part), np.log(1e-11 if kind == "xs" else 1e-3))
+                hi = np.full(len(part), np.log(200.0))
+                owner, en_inc, _, _ = _energies(rng, points, lo, hi)
+                value = rng.lognormal(0.0, 2.0, size=len(owner))
+                data = {
+                    "reaction_id": part[owner],
+                    "en_inc": en_inc,
+                    "data": value,
+                    "xslow": value * 0.95,
+                    "xshigh": value * 1.05,
+                    "ddata": value * 0.05,
+                    "angle": rng.uniform(0, 180, size=len(owner)),
+                    "charge": rng.integers(30, 65, size=len(owner)),
+                    "mass": rng.integers(75, 160, size=len(owner)),
+                }
+                _insert(conn, table, data, len(owner))
+                counts[table.name] = len(owner)
+
+        ids = reactions["reaction_id"][np.isin(obs_type, RESONANCE_OBS)]
+        value = rng.lognormal(0.0, 2.0, size=len(ids))
+        deviation = rng.normal(0.0, 0.1, size=len(ids))
+        resonance = {
+            "reaction_id": ids,
+            "value": value,
+            "dvalue": value * 0.05,
+            "n_exper": rng.integers(0, 20, size=len(ids)),
+            "rel_dev_comp": deviation,
+            "rel_dev_ndl": deviation * 1.1,
+            "rel_dev_exfor": deviation * 0.9,
+            "rel_dev_all": deviation,
+            "spectrum": np.full(len(ids), "MXW", dtype=object),
+        }
+        _insert(conn, lib_models.resonancetable_data, resonance, len(ids))
+        counts["resonancetable_data"] = len(ids)
+
+    engine.dispose()
+    return counts
+
+
+def _create(path, metadata):
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    metadata.create_all(engine)
+    return engine
+
+
+def _build_once(path, builder, rows, seed):
+    """Build into a temporary file first so that an interrupted run is not reused."""
+    if os.path.exists(path):
+        return
+    tmp = path + ".tmp"
+    print(os.path.basename(path), builder(tmp, rows, seed))
+    os.replace(tmp, path)
+
+
+def build(out_dir, data_rows=1_000_000, lib_rows=1_000_000, seed=0) -> dict:
+    """
+    Create (or reuse) exfor and endftables databases of the given size in
+    out_dir and return their paths as {"exfor": ..., "endftables": ...}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        "exfor": os.path.join(out_dir, f"exfor_{data_rows}_{seed}.sqlite"),
+        "endftables": os.path.join(out_dir, f"endftables_{lib_rows}_{seed}.sqlite"),
+    }
+    _build_once(paths["exfor"], build_exfor, data_rows, seed)
+    _build_once(paths["endftables"], build_endftables, lib_rows, seed)
+    return paths
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        sys.exit("usage: python -m submodules.benchmarks.synthetic OUT_DIR [data_rows] [lib_rows]")
+    build(args[0], *(int(arg) for arg in args[1:3]))
@@ -0,0 +1,183 @@
+import os
+import gzip
+import json
+import hashlib
+import tempfile
+import importlib
+import threading
+from sqlalchemy import select
+
+try:
+    from config import engines
+except Exception:
+    module_name = __name__.split(".")[0]
+    config = importlib.import_module(f"{module_name}.config")
+    engines = config.engines
+
+from endftables_sql.scripts.models_core import endf_reactions
+
+from ..utilities.db import FINGERPRINT_MAX_AGE, db_fingerprint
+
+
+######## -------------------------------------- ########
+#    Dropdown catalogue of endf_reactions
+#
+#    The distinct targets, processes, MTs per MF, evaluations per target
+#    and obs_types per projectile are computed in one scan of
+#    endf_reactions and kept as a small gzipped JSON file, so that worker
+#    start does not run one SELECT DISTINCT per dropdown. The catalogue is
+#    loaded on first use; when the database changes it keeps being served
+#    while a new one is built in a background thread.
+######## -------------------------------------- ########
+
+# Catalogue file; None keeps the catalogue in memory only
+CATALOGUE_FILE = os.environ.get("ENDFTABLES_CATALOGUE_FILE")
+
+_catalogue = None
+_refreshing = False
+_lock = threading.Lock()
+
+
+def _release(engine) -> str:
+    """Short id of the library release, from the fingerprint of endf_reactions."""
+    fingerprint = db_fingerprint(engine, endf_reactions, max_age=FINGERPRINT_MAX_AGE)
+    return hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:16]
+
+
+def _sorted(values) -> list:
+    return sorted(value for value in values if value is not None)
+
+
+def build_catalogue(engine=None) -> dict:
+    """
+    All dropdown facets of endf_reactions from one scan:
+
+    targets     : [target]
+    processes   : [process]
+    mt          : {mf: [mt]}
+    evaluations : {target: [evaluation]}
+    obs_types   : {projectile: [obs_type]}
+
+    NULL values are left out.
+    """
+    engine = engine or engines["endftables"]
+    stmt = select(
+        endf_reactions.c.target,
+        endf_reactions.c.projectile,
+        endf_reactions.c.evaluation,
+        endf_reactions.c.obs_type,
+        endf_reactions.c.process,
+        endf_reactions.c.mf,
+        endf_reactions.c.mt,
+    ).distinct()
+
+    targets, processes = set(), set()
+    mt, evaluations, obs_types = {}, {}, {}
+    with engine.connect() as conn:
+        for target, projectile, evaluation, obs_type, process, mf, mt_ in conn.execute(stmt):
+            targets.add(target)
+            processes.add(process)
+            if mf is not None:
+                mt.setdefault(int(mf), set()).add(mt_)
+            if target is not None:
+                evaluations.setdefault(target, set()).add(evaluation)
+            if projectile is not None:
+                obs_types.setdefault(projectile, set()).add(obs_type)
+
+    return {
+        "release": _release(engine),
+        "targets": _sorted(targets),
+        "processes": _sorted(processes),
+        "mt": {mf: _sorted(values) for mf, values in sorted(mt.items())},
+        "evaluations": {key: _sorted(values) for key, values in sorted(evaluations.items())},
+        "obs_types": {key: _sorted(values) for key, values in sorted(obs_types.items())},
+    }
+
+
+def write_catalogue(catalogue: dict, path):
+    """Write the catalogue atomically as gzipped JSON."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(catalogue, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_catalogue(path) -> dict:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        catalogue = json.load(f)
+    # JSON object keys are strings
+    catalogue["mt"] = {int(mf): values for mf, values in catalogue["mt"].items()}
+    return catalogue
+
+
+def _build_and_store():
+    """Build the catalogue and write CATALOGUE_FILE when it can be written."""
+    catalogue = build_catalogue()
+    if CATALOGUE_FILE:
+        try:
+            write_catalogue(catalogue, CATALOGUE_FILE)
+        except OSError:
+            pass
+    return catalogue
+
+
+def _refresh():
+    global _catalogue, _refreshing
+    try:
+        catalogue = _build_and_store()
+        with _lock:
+            _catalogue = catalogue
+    finally:
+        with _lock:
+            _refreshing = False
+
+
+def refresh_catalogue(wait=False):
+    """Rebuild the catalogue in a background thread (or in this one with wait=True)."""
+    global _refreshing
+    with _lock:
+        if _refreshing and not wait:
+            return
+        _refreshing = True
+
+    if wait:
+        _refresh()
+    else:
+        threading.Thread(target=_refresh, name="endftables-catalogue", daemon=True).start()
+
+
+def get_catalogue() -> dict:
+    """
+    The current catalogue, loaded from CATALOGUE_FILE or built on first use.
+    A catalogue of an older release is returned as is while the new one is
+    built in the background. Do not modify the returned dict.
+    """
+    global _catalogue
+    with _lock:
+        catalogue = _catalogue
+
+    if catalogue is None:
+        with _lock:
+            if _catalogue is None and CATALOGUE_FILE and os.path.exists(CATALOGUE_FILE):
+                try:
+                    _catalogue = load_catalogue(CATALOGUE_FILE)
+                except (OSError, ValueError, KeyError):
+                    _catalogue = None
+            catalogue = _catalogue
+
+        if catalogue is None:
+            catalogue = _build_and_store()
+            with _lock:
+                _catalogue = catalogue
+            return catalogue
+
+    if catalogue["release"] != _release(engines["endftables"]):
+        refresh_catalogue()
+    return catalogue
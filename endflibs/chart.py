@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import importlib
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, and_
+
+try:
+    from config import engines
+except Exception:
+    module_name = __name__.split(".")[0]
+    config = importlib.import_module(f"{module_name}.config")
+    engines = config.engines
+
+from endftables_sql.scripts.models_core import endf_reactions, resonancetable_data
+
+from ..utilities.elem import ELEMS
+from ..utilities.instrument import read_sql
+from ..utilities.mass import mass_range
+
+
+######## -------------------------------------- ########
+#    Chart-of-nuclides export of resonancetable_data
+#
+#    Every (obs_type, process, source) becomes one layer of a dense
+#    float32 array indexed by (field, Z, N), written as a .npy file next
+#    to a .json description of the layers. Web workers map the .npy file
+#    once (load_chart) and slice heatmap tiles out of it without SQL.
+#    Z and N run from 0 to the largest values of utilities.mass.mass_range;
+#    cells without a value, or outside the mass range of their Z, are NaN.
+######## -------------------------------------- ########
+
+# Fields of every layer, in the order of the second axis
+CHART_FIELDS = (
+    "value",
+    "dvalue",
+    "rel_dev_comp",
+    "rel_dev_ndl",
+    "rel_dev_exfor",
+    "rel_dev_all",
+)
+
+# obs_types exported when none are given
+CHART_OBS = ["thermal", "macs", "D0"]
+
+_Z = {elem: z for z, elem in enumerate(ELEMS, start=1)}
+
+
+def chart_bounds() -> tuple:
+    """(z_max, n_max) of the grid, from mass_range."""
+    z_max = max(int(z) for z in mass_range)
+    n_max = max(int(a["max"]) - int(z) for z, a in mass_range.items())
+    return z_max, n_max
+
+
+def _mass_limits(z_max) -> tuple:
+    a_min = np.full(z_max + 1, -1)
+    a_max = np.full(z_max + 1, -1)
+    for z, a in mass_range.items():
+        a_min[int(z)], a_max[int(z)] = int(a["min"]), int(a["max"])
+    return a_min, a_max
+
+
+def _chart_rows(obs_types, sources) -> pd.DataFrame:
+    conditions = [endf_reactions.c.obs_type.in_(list(obs_types))]
+    if sources is not None:
+        conditions.append(endf_reactions.c.evaluation.in_(list(sources)))
+
+    stmt = (
+        select(
+            endf_reactions.c.target,
+            endf_reactions.c.obs_type,
+            endf_reactions.c.process,
+            endf_reactions.c.evaluation.label("source"),
+            *[resonancetable_data.c[field] for field in CHART_FIELDS],
+        )
+        .select_from(
+            resonancetable_data.join(
+                endf_reactions,
+                resonancetable_data.c.reaction_id == endf_reactions.c.reaction_id,
+            )
+        )
+        .where(and_(*conditions))
+        .order_by(
+            endf_reactions.c.obs_type,
+            endf_reactions.c.process,
+            endf_reactions.c.evaluation,
+            endf_reactions.c.target,
+            endf_reactions.c.residual,
+        )
+    )
+    with engines["endftables"].connect() as conn:
+        return read_sql(stmt, conn)
+
+
+def build_chart(obs_types=None, sources=None) -> tuple:
+    """
+    (array, meta) of the chart of nuclides.
+
+    array : float32, shape (layers, len(CHART_FIELDS), z_max + 1, n_max + 1)
+    meta  : dict with fields, layers ([obs_type, process, source] per layer),
+            z_max, n_max and skipped (rows not placed on the grid: isomeric
+            targets, unknown elements, masses outside mass_range)
+
+    When a nuclide has several rows in a layer (residual -g/-m variants)
+    the first one after ordering by residual is kept.
+    """
+    obs_types = obs_types or CHART_OBS
+    z_max, n_max = chart_bounds()
+    df = _chart_rows(obs_types, sources)
+
+    # ground-state targets only, e.g. U235 but not Am242m
+    parts = df["target"].str.extract(r"^([A-Z][a-z]?)(\d+)$")
+    z = parts[0].map(_Z).fillna(-1).astype(np.int64).to_numpy()
+    a = pd.to_numeric(parts[1], errors="coerce").fillna(-1).astype(np.int64).to_numpy()
+
+    a_min, a_max = _mass_limits(z_max)
+    zc = np.clip(z, 0, z_max)
+    placed = (z >= 0) & (z <= z_max) & (a >= a_min[zc]) & (a <= a_max[zc]) & (a >= z)
+
+    df = df.assign(z=z, n=a - z, process=df["process"].fillna(""))[placed]
+    df = df.drop_duplicates(["obs_type", "process", "source", "z", "n"])
+    layer, layers = pd.MultiIndex.from_frame(df[["obs_type", "process", "source"]]).factorize()
+
+    array = np.full((len(layers), len(CHART_FIELDS), z_max + 1, n_max + 1), np.nan, dtype=np.float32)
+    values = df[list(CHART_FIELDS)].to_numpy(dtype=np.float32)
+    for i in range(len(CHART_FIELDS)):
+        array[layer, i, df["z"].to_numpy(), df["n"].to_numpy()] = values[:, i]
+
+    meta = {
+        "fields": list(CHART_FIELDS),
+        "layers": [list(key) for key in layers],
+        "z_max": z_max,
+        "n_max": n_max,
+        "shape": list(array.shape),
+        "skipped": int((~placed).sum()),
+    }
+    return array, meta
+
+
+def write_chart(path, obs_types=None, sources=None) -> dict:
+    """
+    Export the chart to path.npy (array) and path.json (meta), both
+    replaced atomically; returns meta.
+    """
+    array, meta = build_chart(obs_types, sources)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    tmp = f"{path}.tmp.npy"
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=array.dtype, shape=array.shape)
+    out[...] = array
+    out.flush()
+    del out
+    os.replace(tmp, f"{path}.npy")
+
+    with open(f"{path}.json.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(f"{path}.json.tmp", f"{path}.json")
+    return meta
+
+
+def load_chart(path) -> tuple:
+    """(read-only memmap, meta) of a chart written by write_chart."""
+    with open(f"{path}.json") as f:
+        meta = json.load(f)
+    array = np.load(f"{path}.npy", mmap_mode="r")
+    if list(array.shape) != meta["shape"]:
+        raise ValueError(f"{path}.npy does not match {path}.json, export in progress?")
+    return array, meta
+
+
+def chart_layer(array, meta, obs_type, source="selected", field="value", process=None):
+    """
+    (Z, N) view of one field of one layer. process may be left out when the
+    obs_type has a single channel in the export.
+    """
+    matches = [
+        i
+        for i, (obs, proc, src) in enumerate(meta["layers"])
+        if obs == obs_type and src == source and (process is None or proc == process)
+    ]
+    if len(matches) != 1:
+        raise KeyError((obs_type, process, source))
+    return array[matches[0], meta["fields"].index(field)]
+
+
+if __name__ == "__main__":
+    # python -m submodules.endflibs.chart OUT_PATH [obs_type ...]
+    if len(sys.argv) < 2:
+        sys.exit("usage: python -m submodules.endflibs.chart OUT_PATH [obs_type ...]")
+    meta = write_chart(sys.argv[1], sys.argv[2:] or None)
+    print(f"{len(meta['layers'])} layers, shape {meta['shape']}, {meta['skipped']} rows skipped")
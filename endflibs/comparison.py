@@ -0,0 +1,259 @@
+import numpy as np
+import pandas as pd
+
+
+######## -------------------------------------- ########
+#    Experimental points against evaluated libraries
+#
+#    All library curves are concatenated into one array sorted by
+#    (library, log energy), so that a single searchsorted locates every
+#    (EXFOR point, library) pair in its grid interval and the
+#    interpolation, C/E and weighted residuals are computed for all
+#    pairs at once. Points outside a library's energy range get NaN.
+######## -------------------------------------- ########
+
+# Interpolation per library when not given: "loglog" or "linlin".
+# loglog falls back to linlin on intervals with non-positive values.
+DEFAULT_SCHEME = "loglog"
+
+# Width of the log10(energy) band reserved per library in the sort key;
+# energies in MeV from 1e-20 to 1e20 fit.
+_KEY_SPAN = 64.0
+_KEY_OFFSET = 32.0
+
+
+def _grid_key(lib_index, energy):
+    """Sort key (library, energy) as one float, monotonic in energy per library."""
+    log_e = np.log10(np.clip(energy, 1e-30, None))
+    return lib_index * _KEY_SPAN + np.clip(log_e + _KEY_OFFSET, 0.0, _KEY_SPAN - 1.0)
+
+
+def interpolate_libraries(lib_x, lib_y, lib_index, n_libs, x, schemes):
+    """
+    Values of every library at every energy of x.
+
+    lib_x, lib_y, lib_index : concatenated grids, lib_index in [0, n_libs)
+    x                       : energies to interpolate at
+    schemes                 : bool array per library, True for log-log
+
+    Returns an array of shape (n_libs, len(x)), NaN outside a library's range.
+    """
+    order = np.lexsort((lib_x, lib_index))
+    gx, gy, gi = lib_x[order], lib_y[order], lib_index[order]
+    key = _grid_key(gi, gx)
+
+    # every (library, point) pair
+    pair_lib = np.repeat(np.arange(n_libs), len(x))
+    pair_x = np.tile(x, n_libs)
+
+    # lo: last grid point at or below x, hi: the next one
+    right = np.searchsorted(key, _grid_key(pair_lib, pair_x), side="right")
+    lo = np.clip(right - 1, 0, len(gx) - 1)
+    hi = np.clip(right, 0, len(gx) - 1)
+
+    x0, x1, y0, y1 = gx[lo], gx[hi], gy[lo], gy[hi]
+    own_lo = gi[lo] == pair_lib
+    inside = own_lo & (gi[hi] == pair_lib) & (x0 <= pair_x) & (pair_x <= x1)
+    exact = own_lo & (x0 == pair_x)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        width = x1 - x0
+        t = np.where(width > 0, (pair_x - x0) / width, 0.0)
+        linear = y0 + t * (y1 - y0)
+
+        log_ok = (x0 > 0) & (pair_x > 0) & (y0 > 0) & (y1 > 0) & (width > 0)
+        lt = np.log(pair_x / x0) / np.log(x1 / x0)
+        loglog = y0 * np.exp(lt * np.log(y1 / y0))
+
+    use_log = schemes[pair_lib] & log_ok
+    values = np.where(use_log, loglog, linear)
+    values[~inside] = np.nan
+    # on a grid point (also the last one of a library) take its value as is
+    values[exact] = y0[exact]
+    return values.reshape(n_libs, len(x))
+
+
+def compare_to_libraries(exfor_df, lib_df, libs: dict, schemes=None) -> dict:
+    """
+    C/E of experimental points against evaluated curves.
+
+    exfor_df : data_query result (entry_id, en_inc in MeV, data, ddata)
+    lib_df   : lib_xs_data_query result (reaction_id, en_inc in MeV, data)
+    libs     : {reaction_id: evaluation}, as returned by lib_index_query
+    schemes  : {evaluation: "loglog" | "linlin"}, DEFAULT_SCHEME otherwise
+
+    Returns a dict of DataFrames:
+      points    : one row per (point, library) with calc, ce (calc / data)
+                  and residual ((data - calc) / ddata)
+      entries   : per (entry_id, evaluation): n, chi2, chi2_per_point,
+                  n_ce, mean_ce (n counts the points with a usable ddata,
+                  n_ce all points with a finite C/E)
+      libraries : per evaluation: the same columns
+    """
+    schemes = schemes or {}
+    present = set(lib_df["reaction_id"].unique())
+    reaction_ids = [rid for rid in libs if rid in present]
+    evaluations = [libs[rid] for rid in reaction_ids]
+    n_libs = len(reaction_ids)
+
+    x = exfor_df["en_inc"].to_numpy(dtype=float)
+    data = exfor_df["data"].to_numpy(dtype=float)
+    ddata = exfor_df["ddata"].to_numpy(dtype=float) if "ddata" in exfor_df else np.full(len(x), np.nan)
+    entry_codes, entry_ids = pd.factorize(exfor_df["entry_id"])
+    eval_codes, eval_labels = pd.factorize(pd.Series(evaluations, dtype=object))
+
+    if n_libs == 0 or len(x) == 0:
+        calc = np.empty((0, len(x)))
+    else:
+        position = {rid: i for i, rid in enumerate(reaction_ids)}
+        lib_rows = lib_df[lib_df["reaction_id"].isin(position)]
+        calc = interpolate_libraries(
+            lib_rows["en_inc"].to_numpy(dtype=float),
+            lib_rows["data"].to_numpy(dtype=float),
+            lib_rows["reaction_id"].map(position).to_numpy(dtype=np.int64),
+            n_libs,
+            x,
+            np.array([schemes.get(ev, DEFAULT_SCHEME) == "loglog" for ev in evaluations]),
+        )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ce = calc / data
+        residual = np.where(ddata > 0, (data - calc) / ddata, np.nan)
+
+    points = pd.DataFrame(
+        {
+            # categorical: the labels are repeated len(x) and n_libs times
+            "entry_id": pd.Categorical.from_codes(np.tile(entry_codes, n_libs), entry_ids),
+            "evaluation": pd.Categorical.from_codes(np.repeat(eval_codes, len(x)), eval_labels),
+            "reaction_id": np.repeat(np.array(reaction_ids), len(x)),
+            "en_inc": np.tile(x, n_libs),
+            "data": np.tile(data, n_libs),
+            "ddata": np.tile(ddata, n_libs),
+            "calc": calc.ravel(),
+            "ce": ce.ravel(),
+            "residual": residual.ravel(),
+        }
+    )
+
+    return {
+        "points": points,
+        "entries": _chi2_summary(points, ["entry_id", "evaluation"]),
+        "libraries": _chi2_summary(points, ["evaluation"]),
+    }
+
+
+def _chi2_summary(points, by) -> pd.DataFrame:
+    """
+    C/E over every pair with finite data and calc; chi2 only over the pairs
+    that also have a usable ddata (finite residual).
+    """
+    valid = points[np.isfinite(points["ce"])]
+    summary = (
+        valid.assign(chi2=valid["residual"] ** 2)
+        .groupby(by, sort=False, observed=True)
+        .agg(
+            n=("chi2", "count"),
+            chi2=("chi2", "sum"),
+            n_ce=("ce", "size"),
+            mean_ce=("ce", "mean"),
+        )
+        .reset_index()
+    )
+    summary["chi2_per_point"] = summary["chi2"].where(summary["n"] > 0) / summary["n"]
+    return summary
+
+
+######## -------------------------------------- ########
+#    Spread of the evaluated libraries
+#
+#    All curves of one reaction are interpolated onto a common energy
+#    grid in one interpolate_libraries call; the envelope (min, max,
+#    mean, std) and the library farthest from the mean are computed
+#    column-wise over the (n_libs, n_grid) array.
+######## -------------------------------------- ########
+
+# Grid points of the "adaptive" energy grid
+ENVELOPE_MAX_POINTS = 2000
+
+
+def energy_grid(lib_df, mode="union", max_points=ENVELOPE_MAX_POINTS) -> np.ndarray:
+    """
+    Common energy grid (MeV) of all curves in lib_df.
+
+    union    : every energy of every library
+    adaptive : max_points energies picked at equal steps through the sorted
+               union, so that the grid is dense where the libraries are
+               (resonance regions) and sparse on smooth parts
+    """
+    union = np.unique(lib_df["en_inc"].to_numpy(dtype=float))
+    if mode == "union" or len(union) <= max_points:
+        return union
+    if mode != "adaptive":
+        raise ValueError(f"unknown energy grid mode: {mode}")
+    picks = np.linspace(0, len(union) - 1, max_points).round().astype(np.int64)
+    return union[np.unique(picks)]
+
+
+def library_envelope(lib_df, libs: dict, grid="union", max_points=ENVELOPE_MAX_POINTS, schemes=None) -> pd.DataFrame:
+    """
+    Envelope of the evaluated curves of one reaction on a common energy grid.
+
+    lib_df  : lib_xs_data_query result (reaction_id, en_inc in MeV, data)
+    libs    : {reaction_id: evaluation}, as returned by lib_index_query
+    grid    : "union", "adaptive" (see energy_grid) or an array of energies
+    schemes : {evaluation: "loglog" | "linlin"}, DEFAULT_SCHEME otherwise
+
+    Returns one row per grid energy with en_inc, min, max, mean, std, n_libs
+    (libraries covering the energy) and outlier, the position in
+    attrs["evaluations"] of the library farthest from the mean (-1 when
+    fewer than two libraries cover the energy).
+    """
+    schemes = schemes or {}
+    present = set(lib_df["reaction_id"].unique())
+    reaction_ids = [rid for rid in libs if rid in present]
+    evaluations = [libs[rid] for rid in reaction_ids]
+    n_libs = len(reaction_ids)
+
+    if isinstance(grid, str):
+        x = energy_grid(lib_df[lib_df["reaction_id"].isin(libs)], grid, max_points)
+    else:
+        x = np.asarray(grid, dtype=float)
+
+    if n_libs == 0 or len(x) == 0:
+        values = np.full((max(n_libs, 1), len(x)), np.nan)
+    else:
+        position = {rid: i for i, rid in enumerate(reaction_ids)}
+        lib_rows = lib_df[lib_df["reaction_id"].isin(position)]
+        values = interpolate_libraries(
+            lib_rows["en_inc"].to_numpy(dtype=float),
+            lib_rows["data"].to_numpy(dtype=float),
+            lib_rows["reaction_id"].map(position).to_numpy(dtype=np.int64),
+            n_libs,
+            x,
+            np.array([schemes.get(ev, DEFAULT_SCHEME) == "loglog" for ev in evaluations]),
+        )
+
+    covered = np.isfinite(values)
+    n = covered.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total = np.where(covered, values, 0.0).sum(axis=0)
+        mean = np.where(n > 0, total / n, np.nan)
+        deviation = np.where(covered, np.abs(values - mean), -1.0)
+        std = np.sqrt(np.where(covered, deviation**2, 0.0).sum(axis=0) / n)
+
+    outlier = np.where(n > 1, deviation.argmax(axis=0), -1)
+
+    envelope = pd.DataFrame(
+        {
+            "en_inc": x,
+            "min": np.where(n > 0, np.where(covered, values, np.inf).min(axis=0), np.nan),
+            "max": np.where(n > 0, np.where(covered, values, -np.inf).max(axis=0), np.nan),
+            "mean": mean,
+            "std": np.where(n > 0, std, np.nan),
+            "n_libs": n,
+            "outlier": outlier,
+        }
+    )
+    envelope.attrs["evaluations"] = evaluations
+    envelope.attrs["reaction_ids"] = reaction_ids
+    return envelope
@@ -1,5 +1,9 @@
+import os
 import sys
+import hashlib
 import importlib
+from itertools import groupby
+import numpy as np
 import pandas as pd
 from sqlalchemy import select, and_, or_, distinct
 
@@ -20,6 +24,13 @@ from endftables_sql.scripts.models_core import (
     resonancetable_data,
 )
 from ..utilities.util import libstyle_nuclide_expression
+from ..utilities.db import FINGERPRINT_MAX_AGE, execute_cached, db_fingerprint
+from ..utilities.cache import FingerprintCache, frame_nbytes
+from ..utilities.frames import compact_frame
+from ..utilities.aio import run_query
+from ..utilities.instrument import instrumented, frame_timer, db_timer, read_sql, instrument_engine
+from .comparison import library_envelope, ENVELOPE_MAX_POINTS
+from .catalogue import get_catalogue
 
 
 
@@ -59,38 +70,138 @@ LIB_OBS_TYPE_CONFIG: dict = {
 }
 
 
-def lib_index_query(input_store):
+# When True, lib_index_query runs through the compiled statement cache of
+# utilities/db.py instead of building and compiling a new select() per call.
+USE_STATEMENT_CACHE = True
+
+# DB time of the instrumented query functions (see utilities/instrument.py)
+instrument_engine(engines["endftables"])
+
+
+######## -------------------------------------- ########
+#    Lookup cache
+#
+#    lib_index_query, lib_residual_nuclide_list, resonancetable_index_query
+#    and resonancetable_source_list are called with the same few thousand
+#    keys over and over, while endftables only changes with a new library
+#    release. Their results are memoised on the normalised request
+#    (lib-style target, projectile, db obs_type, MT, ...) together with the
+#    fingerprint of endf_reactions, in memory and, when LOOKUP_CACHE_DIR
+#    is set, in a directory shared by the worker processes.
+######## -------------------------------------- ########
+
+# When False every lookup goes to the database
+USE_LOOKUP_CACHE = True
+
+# Number of memoised results kept in memory and in LOOKUP_CACHE_DIR, least
+# recently used are evicted first
+LOOKUP_CACHE_MAX_ENTRIES = 20_000
+
+# Directory shared between processes, one file per result and library release,
+# writable only by those processes (the files are unpickled).
+# None keeps the cache in memory only.
+LOOKUP_CACHE_DIR = os.environ.get("ENDFTABLES_LOOKUP_CACHE_DIR")
+
+# (function name, normalised request) -> result, see FingerprintCache
+_lookup_cache = FingerprintCache(
+    max_entries=LOOKUP_CACHE_MAX_ENTRIES,
+    shared_dir=LOOKUP_CACHE_DIR,
+    shared_max_files=LOOKUP_CACHE_MAX_ENTRIES,
+)
+
+
+def _lookup(name, key, compute):
+    """compute() memoised under (name, key) until the library release changes."""
+    if not USE_LOOKUP_CACHE:
+        return compute()
+
+    fingerprint = db_fingerprint(engines["endftables"], endf_reactions, max_age=FINGERPRINT_MAX_AGE)
+    return _lookup_cache.get_or_compute((name, key), fingerprint, compute, label=name)
+
+
+def lookup_cache_stats() -> dict:
+    """Memory use, and hits, shared_hits (LOOKUP_CACHE_DIR) and misses per function in "labels"."""
+    return _lookup_cache.stats()
+
+
+def clear_lookup_cache():
+    """Empty the in-memory tier and the statistics; the shared directory is kept."""
+    _lookup_cache.clear()
+
+
+def _select_lib_reactions(conditions):
+    return select(endf_reactions.c.reaction_id, endf_reactions.c.evaluation).where(
+        and_(*conditions)
+    )
+
+
+def _lib_index_conditions(input_store) -> list:
+    """Conditions on endf_reactions for one page-level input_store, None if no lib data exists."""
     obs_type = input_store.get("obs_type").upper()
     config = LIB_OBS_TYPE_CONFIG[obs_type]
 
     if config["db_obs_type"] is None:
-        return {}  # no evaluated library data for this observable type
+        return None  # no evaluated library data for this observable type
 
     target = libstyle_nuclide_expression(
         input_store.get("target_elem"), input_store.get("target_mass")
     )
-    queries = [
+    return [
         endf_reactions.c.target == target,
         endf_reactions.c.projectile == input_store.get("reaction").split(",")[0].lower(),
         endf_reactions.c.obs_type == config["db_obs_type"],
         *config["extra"](input_store),
     ]
 
-    stmt = select(endf_reactions.c.reaction_id, endf_reactions.c.evaluation).where(
-        and_(*queries)
+
+def _lib_index_key(input_store) -> tuple:
+    """
+    Normalised lib_index_query request for the lookup cache. An obs_type
+    whose extra conditions read other input_store keys must add them here.
+    """
+    config = LIB_OBS_TYPE_CONFIG[input_store.get("obs_type").upper()]
+    mt = input_store.get("mt") if config["extra"] is _lib_cond_mt else None
+    residual = (
+        libstyle_nuclide_expression(input_store.get("rp_elem"), input_store.get("rp_mass"))
+        if config["extra"] is _lib_cond_rp
+        else None
     )
+    return (
+        libstyle_nuclide_expression(input_store.get("target_elem"), input_store.get("target_mass")),
+        input_store.get("reaction").split(",")[0].lower(),
+        config["db_obs_type"],
+        int(mt) if mt else None,
+        residual,
+    )
+
+
+def _lib_index_rows(queries) -> dict:
     with engines["endftables"].connect() as conn:
-        results = conn.execute(stmt).fetchall()
+        if USE_STATEMENT_CACHE:
+            results = execute_cached(
+                conn, "endf_reactions", _select_lib_reactions, queries
+            )
+        else:
+            results = conn.execute(_select_lib_reactions(queries)).fetchall()
 
     return {row.reaction_id: row.evaluation for row in results}
 
 
-def lib_residual_nuclide_list(elem, mass, inc_pt):
-    target = libstyle_nuclide_expression(elem, mass)
+@instrumented
+def lib_index_query(input_store):
+    queries = _lib_index_conditions(input_store)
+    if queries is None:
+        return {}
+
+    return _lookup(
+        "lib_index_query", _lib_index_key(input_store), lambda: _lib_index_rows(queries)
+    )
+
 
+def _lib_residual_nuclides(target, projectile) -> list:
     stmt = select(endf_reactions.c.residual).where(
         endf_reactions.c.obs_type == "residual",
-        endf_reactions.c.projectile == inc_pt.lower(),
+        endf_reactions.c.projectile == projectile,
         endf_reactions.c.target == target,
     )
 
@@ -100,59 +211,326 @@ def lib_residual_nuclide_list(elem, mass, inc_pt):
     return [row.residual for row in results] if results else []
 
 
-def lib_data_query(input_store, ids):
+@instrumented
+def lib_residual_nuclide_list(elem, mass, inc_pt):
+    target = libstyle_nuclide_expression(elem, mass)
+    projectile = inc_pt.lower()
+    return _lookup(
+        "lib_residual_nuclide_list",
+        (target, projectile),
+        lambda: _lib_residual_nuclides(target, projectile),
+    )
+
+
+@instrumented
+def lib_data_query(input_store, ids, en_min=None, en_max=None, compact=False):
+    """
+    Evaluated data of the reaction_ids for the obs_type. en_min/en_max (MeV)
+    restrict the incident energy in SQL for XS, DA and RP. compact=True
+    returns smaller dtypes (see compact_frame).
+    """
     obs_type = input_store["obs_type"].upper()
     if obs_type == "XS":
-        return lib_xs_data_query(ids, thermal=False)
+        return lib_xs_data_query(ids, thermal=False, en_min=en_min, en_max=en_max, compact=compact)
     elif obs_type == "TH":
-        return lib_xs_data_query(ids, thermal=True)
+        return lib_xs_data_query(ids, thermal=True, compact=compact)
     elif obs_type == "FY":
-        return lib_fy_data_query(ids)
+        return lib_fy_data_query(ids, compact=compact)
     elif obs_type == "DA":
-        return lib_da_data_query(ids)
+        return lib_da_data_query(ids, en_min=en_min, en_max=en_max, compact=compact)
     elif obs_type == "RP":
         inc_pt = input_store["reaction"].split(",")[0].lower()
-        return lib_residual_data_query(inc_pt, ids)
+        return lib_residual_data_query(inc_pt, ids, en_min=en_min, en_max=en_max, compact=compact)
 
 
-def lib_xs_data_query(ids, thermal):
-    queries = [endf_xs_data.c.reaction_id.in_(ids)]
-    if thermal:
-        queries.append(endf_xs_data.c.en_inc == 2.53e-8)
-    stmt = select(endf_xs_data).where(and_(*queries))
+def _energy_window(table, en_min, en_max) -> list:
+    """Conditions on table.en_inc for an incident energy window in MeV."""
+    queries = []
+    if en_min is not None:
+        queries.append(table.c.en_inc >= en_min)
+    if en_max is not None:
+        queries.append(table.c.en_inc <= en_max)
+    return queries
+
+
+def _lib_data_table(input_store):
+    """Data table and extra filters read by lib_data_query for the obs_type, or (None, [])."""
+    obs_type = input_store["obs_type"].upper()
+    if obs_type == "XS":
+        return endf_xs_data, []
+    elif obs_type == "TH":
+        return endf_xs_data, [endf_xs_data.c.en_inc == 2.53e-8]
+    elif obs_type == "FY":
+        return endf_fy_data, []
+    elif obs_type == "DA":
+        return endf_angle_data, []
+    elif obs_type == "RP":
+        inc_pt = input_store["reaction"].split(",")[0].lower()
+        return (endf_n_residual_data if inc_pt == "n" else endf_residual_data), []
+    return None, []
+
+
+@instrumented
+def lib_reaction_query(input_store):
+    """
+    lib_index_query and lib_data_query in one statement: the endf_reactions
+    conditions are joined directly to the endf_*_data table of the obs_type.
+
+    Returns (libs, df) as lib_index_query(input_store) and
+    lib_data_query(input_store, libs) would; df is None for obs_types
+    without a data table.
+    """
+    queries = _lib_index_conditions(input_store)
+    if queries is None:
+        return {}, None
+
+    table, filters = _lib_data_table(input_store)
+    if table is None:
+        return lib_index_query(input_store), None
+
+    stmt = (
+        select(
+            endf_reactions.c.reaction_id.label("lib_reaction_id"),
+            endf_reactions.c.evaluation.label("lib_evaluation"),
+            table,
+        )
+        .select_from(
+            endf_reactions.outerjoin(
+                table,
+                and_(table.c.reaction_id == endf_reactions.c.reaction_id, *filters),
+            )
+        )
+        .where(and_(*queries))
+    )
+
     with engines["endftables"].connect() as conn:
-        df = pd.DataFrame(
-            conn.execute(stmt).fetchall(), columns=stmt.selected_columns.keys()
+        df = read_sql(stmt, conn)
+
+    libs = dict(zip(df["lib_reaction_id"], df["lib_evaluation"]))
+    # reactions without data points come back once with NULL data columns
+    df = df[df["reaction_id"].notna()][list(table.columns.keys())]
+
+    return libs, df.reset_index(drop=True)
+
+
+######## -------------------------------------- ########
+#    Multi-target batches (trend plots, chart of nuclides)
+######## -------------------------------------- ########
+
+# Rows fetched from the cursor at a time by iter_lib_data_targets
+LIB_TARGETS_CHUNK_SIZE = 50_000
+
+
+def _lib_targets_conditions(targets, projectile, obs_type, mt=None, evaluations=None) -> list:
+    """endf_reactions conditions for many targets, given as lib-style names or (elem, mass)."""
+    config = LIB_OBS_TYPE_CONFIG[obs_type.upper()]
+    names = sorted({
+        target if isinstance(target, str) else libstyle_nuclide_expression(target[0], str(target[1]))
+        for target in targets
+    })
+    conditions = [
+        endf_reactions.c.target.in_(names),
+        endf_reactions.c.projectile == projectile.lower(),
+        endf_reactions.c.obs_type == config["db_obs_type"],
+    ]
+    if mt:
+        conditions.append(endf_reactions.c.mt == int(mt))
+    if evaluations:
+        conditions.append(endf_reactions.c.evaluation.in_(list(evaluations)))
+    return conditions
+
+
+@instrumented
+def lib_index_query_targets(targets, projectile, obs_type, mt=None, evaluations=None) -> pd.DataFrame:
+    """
+    reaction_id, target, evaluation, mt and residual of the reactions of all
+    targets in one endf_reactions query, ordered by target and evaluation.
+    """
+    stmt = (
+        select(
+            endf_reactions.c.reaction_id,
+            endf_reactions.c.target,
+            endf_reactions.c.evaluation,
+            endf_reactions.c.mt,
+            endf_reactions.c.residual,
         )
+        .where(*_lib_targets_conditions(targets, projectile, obs_type, mt, evaluations))
+        .order_by(endf_reactions.c.target, endf_reactions.c.evaluation, endf_reactions.c.reaction_id)
+    )
+    with engines["endftables"].connect() as conn:
+        df = read_sql(stmt, conn)
     return df
 
 
-def lib_da_data_query(ids):
-    stmt = select(endf_angle_data).where(endf_angle_data.c.reaction_id.in_(ids))
+def iter_lib_data_targets(
+    targets,
+    projectile,
+    obs_type,
+    mt=None,
+    evaluations=None,
+    en_min=None,
+    en_max=None,
+    chunk_size=LIB_TARGETS_CHUNK_SIZE,
+):
+    """
+    Data points of the obs_type for many targets at once, e.g. the (n,2n)
+    cross sections of all stable isotopes: one statement joins the
+    endf_reactions conditions to the endf_*_data table and the rows are
+    streamed in chunks of chunk_size.
+
+    Yields (target, evaluation, df) per target and evaluation, in that
+    order; df has the columns of the data table (reaction_id tells apart
+    several reactions of one evaluation, e.g. residuals for RP).
+    """
+    table, filters = _lib_data_table({"obs_type": obs_type, "reaction": f"{projectile},x"})
+    if table is None:
+        return
+
+    stmt = (
+        select(
+            endf_reactions.c.target.label("lib_target"),
+            endf_reactions.c.evaluation.label("lib_evaluation"),
+            table,
+        )
+        .select_from(
+            endf_reactions.join(
+                table,
+                and_(
+                    table.c.reaction_id == endf_reactions.c.reaction_id,
+                    *filters,
+                    *_energy_window(table, en_min, en_max),
+                ),
+            )
+        )
+        .where(*_lib_targets_conditions(targets, projectile, obs_type, mt, evaluations))
+        .order_by(
+            endf_reactions.c.target,
+            endf_reactions.c.evaluation,
+            table.c.reaction_id,
+            table.c.en_inc,
+        )
+    )
+    columns = list(table.columns.keys())
+
     with engines["endftables"].connect() as conn:
-        df = pd.DataFrame(
-            conn.execute(stmt).fetchall(), columns=stmt.selected_columns.keys()
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+        for (target, evaluation), rows in groupby(result, key=lambda row: (row[0], row[1])):
+            yield target, evaluation, pd.DataFrame([row[2:] for row in rows], columns=columns)
+
+
+@instrumented
+def lib_data_query_targets(targets, projectile, obs_type, mt=None, evaluations=None, **kwargs) -> dict:
+    """iter_lib_data_targets collected into {(target, evaluation): df}."""
+    return {
+        (target, evaluation): df
+        for target, evaluation, df in iter_lib_data_targets(
+            targets, projectile, obs_type, mt=mt, evaluations=evaluations, **kwargs
         )
-    return df
+    }
 
 
-def lib_residual_data_query(inc_pt, ids):
+@instrumented
+def lib_xs_data_query(ids, thermal, en_min=None, en_max=None, compact=False):
+    queries = [endf_xs_data.c.reaction_id.in_(ids)]
+    if thermal:
+        queries.append(endf_xs_data.c.en_inc == 2.53e-8)
+    queries += _energy_window(endf_xs_data, en_min, en_max)
+    stmt = select(endf_xs_data).where(and_(*queries))
+    with engines["endftables"].connect() as conn:
+        with db_timer():
+            rows = conn.execute(stmt).fetchall()
+        with frame_timer():
+            df = pd.DataFrame(rows, columns=stmt.selected_columns.keys())
+    return compact_frame(df) if compact else df
+
+
+@instrumented
+def lib_da_data_query(ids, en_min=None, en_max=None, compact=False):
+    stmt = select(endf_angle_data).where(
+        endf_angle_data.c.reaction_id.in_(ids),
+        *_energy_window(endf_angle_data, en_min, en_max),
+    )
+    with engines["endftables"].connect() as conn:
+        with db_timer():
+            rows = conn.execute(stmt).fetchall()
+        with frame_timer():
+            df = pd.DataFrame(rows, columns=stmt.selected_columns.keys())
+    return compact_frame(df) if compact else df
+
+
+@instrumented
+def lib_residual_data_query(inc_pt, ids, en_min=None, en_max=None, compact=False):
     table = endf_n_residual_data if inc_pt.lower() == "n" else endf_residual_data
-    stmt = select(table).where(table.c.reaction_id.in_(ids))
+    stmt = select(table).where(
+        table.c.reaction_id.in_(ids), *_energy_window(table, en_min, en_max)
+    )
     with engines["endftables"].connect() as conn:
-        df = pd.DataFrame(
-            conn.execute(stmt).fetchall(), columns=stmt.selected_columns.keys()
-        )
-    return df
+        with db_timer():
+            rows = conn.execute(stmt).fetchall()
+        with frame_timer():
+            df = pd.DataFrame(rows, columns=stmt.selected_columns.keys())
+    return compact_frame(df) if compact else df
 
 
-def lib_fy_data_query(ids):
+@instrumented
+def lib_fy_data_query(ids, compact=False):
     stmt = select(endf_fy_data).where(endf_fy_data.c.reaction_id.in_(ids))
     with engines["endftables"].connect() as conn:
-        df = pd.DataFrame(
-            conn.execute(stmt).fetchall(), columns=stmt.selected_columns.keys()
+        with db_timer():
+            rows = conn.execute(stmt).fetchall()
+        with frame_timer():
+            df = pd.DataFrame(rows, columns=stmt.selected_columns.keys())
+    return compact_frame(df) if compact else df
+
+
+######## -------------------------------------- ########
+#    Envelope of the evaluated libraries (one band instead of one curve per library)
+######## -------------------------------------- ########
+
+# Size bound of the envelope cache, least recently used envelopes are evicted first
+ENVELOPE_CACHE_MAX_BYTES = 256 * 1024**2
+
+# (target, projectile, mt, grid, max_points, en_min, en_max) -> DataFrame
+_envelope_cache = FingerprintCache(max_bytes=ENVELOPE_CACHE_MAX_BYTES, sizeof=frame_nbytes)
+
+
+@instrumented
+def lib_xs_envelope(input_store, grid="union", max_points=ENVELOPE_MAX_POINTS, en_min=None, en_max=None):
+    """
+    min/max/mean/std of the cross sections of all evaluations of the
+    reaction of input_store (see comparison.library_envelope), cached per
+    target, projectile and MT until the endftables database changes.
+    input_store must give the MT: without it every XS reaction of the
+    target would be taken for a library.
+    The returned frame is a shallow copy, do not modify its values in place.
+    """
+    if not input_store.get("mt"):
+        raise ValueError("lib_xs_envelope needs the MT of the reaction in input_store['mt']")
+
+    if isinstance(grid, str):
+        grid_key = grid
+    else:
+        energies = np.ascontiguousarray(grid, dtype=float)
+        grid_key = ("array", len(energies), hashlib.sha1(energies.tobytes()).hexdigest())
+
+    key = (
+        libstyle_nuclide_expression(input_store.get("target_elem"), input_store.get("target_mass")),
+        input_store.get("reaction").split(",")[0].lower(),
+        int(input_store["mt"]),
+        grid_key,
+        max_points,
+        en_min,
+        en_max,
+    )
+    def compute():
+        libs = lib_index_query({**input_store, "obs_type": "XS"})
+        df = lib_xs_data_query(list(libs), False, en_min, en_max) if libs else pd.DataFrame(
+            columns=["reaction_id", "en_inc", "data"]
         )
-    return df
+        return library_envelope(df, libs, grid=grid, max_points=max_points)
+
+    fingerprint = db_fingerprint(engines["endftables"], endf_reactions, max_age=FINGERPRINT_MAX_AGE)
+    return _envelope_cache.get_or_compute(key, fingerprint, compute, label="lib_xs_envelope")
 
 
 ######## -------------------------------------- ########
@@ -160,43 +538,38 @@ def lib_fy_data_query(ids):
 ######## -------------------------------------- ########
 
 
+# The dropdown lists come from the catalogue of catalogue.py, built in one
+# scan of endf_reactions instead of one SELECT DISTINCT each.
+
+@instrumented
 def get_unique_target():
-    stmt = select(distinct(endf_reactions.c.target)).order_by(endf_reactions.c.target)
-    with engines["endftables"].connect() as conn:
-        result = conn.execute(stmt)
-        targets = [row[0] for row in result.fetchall()]
-    return targets
+    return list(get_catalogue()["targets"])
 
 
+@instrumented
 def get_unique_proces():
-    stmt = select(distinct(endf_reactions.c.process)).order_by(endf_reactions.c.target)
-    with engines["endftables"].connect() as conn:
-        result = conn.execute(stmt)
-        targets = [row[0] for row in result.fetchall()]
-    return targets
+    return list(get_catalogue()["processes"])
 
 
+@instrumented
 def get_unique_xs_mt():
-    stmt = (
-        select(distinct(endf_reactions.c.mt))
-        .order_by(endf_reactions.c.mt)
-        .where(endf_reactions.c.mf == 3)
-    )
-    with engines["endftables"].connect() as conn:
-        result = conn.execute(stmt)
-        targets = [row[0] for row in result.fetchall()]
-    return targets
+    return list(get_catalogue()["mt"].get(3, []))
 
 
+@instrumented
 def get_all_endf_reaction():
     stmt = select(endf_reactions)
     with engines["endftables"].connect() as conn:
         result = conn.execute(stmt)
-        df = pd.DataFrame(result.fetchall(), columns=result.keys())
+        with db_timer():
+            rows = result.fetchall()
+        with frame_timer():
+            df = pd.DataFrame(rows, columns=result.keys())
 
     return df
 
 
+@instrumented
 def get_reaction_list(input_store):
 
     columns = [
@@ -269,7 +642,7 @@ def get_reaction_list(input_store):
         )
 
     with engines["endftables"].connect() as conn:
-        df = pd.read_sql(stmt, conn)
+        df = read_sql(stmt, conn)
 
     return df
 
@@ -324,6 +697,7 @@ def _to_obs_type(data_type: str, quantity: str) -> str:
     return data_type
 
 
+@instrumented
 def resonancetable_index_query(input_store: dict) -> pd.DataFrame:
     """
     Return all sources for a given nuclide + observable, ordered with
@@ -344,6 +718,16 @@ def resonancetable_index_query(input_store: dict) -> pd.DataFrame:
     DataFrame: source, year, process, residual, value, dvalue, n_exper,
                rel_dev_comp, rel_dev_ndl, rel_dev_exfor, rel_dev_all, spectrum
     """
+    target, obs_type, process = _resonancetable_request(input_store)
+    return _lookup(
+        "resonancetable_index_query",
+        (target, obs_type, process),
+        lambda: _resonancetable_sources(target, obs_type, process),
+    )
+
+
+def _resonancetable_request(input_store: dict) -> tuple:
+    """(lib-style target, obs_type, process) of a resonancetable input_store."""
     elem      = input_store.get("target_elem", "")
     mass      = str(input_store.get("target_mass", 0))
     target    = libstyle_nuclide_expression(elem, mass)
@@ -351,13 +735,18 @@ def resonancetable_index_query(input_store: dict) -> pd.DataFrame:
         input_store.get("data_type", ""), input_store.get("quantity", "")
     )
     process   = input_store.get("process")
+    return target, obs_type, process
+
 
+def _resonancetable_sources(target, obs_type, process, source=None) -> pd.DataFrame:
     conditions = [
         endf_reactions.c.target   == target,
         endf_reactions.c.obs_type == obs_type,
     ]
     if process is not None:
         conditions.append(endf_reactions.c.process == process)
+    if source is not None:
+        conditions.append(endf_reactions.c.evaluation == source)
 
     stmt = (
         select(
@@ -383,21 +772,28 @@ def resonancetable_index_query(input_store: dict) -> pd.DataFrame:
     )
 
     with engines["endftables"].connect() as conn:
-        df = pd.read_sql(stmt, conn)
+        df = read_sql(stmt, conn)
 
     return df
 
 
+@instrumented
 def resonancetable_selected_query(input_store: dict) -> pd.Series:
     """
     Return the single 'selected' (recommended) value for a nuclide + observable.
     Returns a pandas Series, or an empty Series if not found.
+    Only the 'selected' rows are read, the other sources are filtered out in SQL.
     """
-    df = resonancetable_index_query(input_store)
-    sel = df[df["source"] == "selected"]
+    target, obs_type, process = _resonancetable_request(input_store)
+    sel = _lookup(
+        "resonancetable_selected_query",
+        (target, obs_type, process),
+        lambda: _resonancetable_sources(target, obs_type, process, source="selected"),
+    )
     return sel.iloc[0] if not sel.empty else pd.Series(dtype=float)
 
 
+@instrumented
 def resonancetable_nuclide_list(obs_type: str, source: str = "selected") -> pd.DataFrame:
     """
     Return all nuclides with a value for the given obs_type, ordered by target.
@@ -432,13 +828,102 @@ def resonancetable_nuclide_list(obs_type: str, source: str = "selected") -> pd.D
     )
 
     with engines["endftables"].connect() as conn:
-        df = pd.read_sql(stmt, conn)
+        df = read_sql(stmt, conn)
 
     return df
 
 
+# Columns of the resonance-parameter overview: obs_type -> process (None: any).
+# thermal and integral hold several channels, the overview shows capture.
+RESONANCE_OVERVIEW_OBS = {
+    "D0": None,
+    "S0": None,
+    "S1": None,
+    "gamgam0": None,
+    "R": None,
+    "integral": "g",
+    "thermal": "g",
+    "macs": None,
+}
+
+
+@instrumented
+def resonancetable_matrix(
+    obs_types=RESONANCE_OVERVIEW_OBS, source: str = "selected", targets=None
+) -> pd.DataFrame:
+    """
+    Values of many obs_types for all nuclides in one query, pivoted to a
+    nuclide x obs_type matrix.
+
+    Parameters
+    ----------
+    obs_types : list of obs_type, or {obs_type: process} to restrict the channel
+    source    : one source (default 'selected'); None = first source alphabetically
+    targets   : optional list of lib-style targets, e.g. ['U235', 'Fe056']
+
+    Returns
+    -------
+    DataFrame indexed by target, columns (field, obs_type) with field
+    'value' or 'dvalue'; NaN where a nuclide has no value. When a nuclide
+    has several rows for an obs_type (residual -g/-m variants, several
+    sources) the first after ordering by source and residual is kept.
+    """
+    if not isinstance(obs_types, dict):
+        obs_types = {obs_type: None for obs_type in obs_types}
+
+    conditions = [
+        or_(*[
+            and_(endf_reactions.c.obs_type == obs_type, endf_reactions.c.process == process)
+            if process is not None
+            else endf_reactions.c.obs_type == obs_type
+            for obs_type, process in obs_types.items()
+        ])
+    ]
+    if source is not None:
+        conditions.append(endf_reactions.c.evaluation == source)
+    if targets is not None:
+        conditions.append(endf_reactions.c.target.in_(list(targets)))
+
+    stmt = (
+        select(
+            endf_reactions.c.target,
+            endf_reactions.c.obs_type,
+            resonancetable_data.c.value,
+            resonancetable_data.c.dvalue,
+        )
+        .select_from(_rt_join)
+        .where(and_(*conditions))
+        .order_by(
+            endf_reactions.c.target,
+            endf_reactions.c.obs_type,
+            endf_reactions.c.evaluation,
+            endf_reactions.c.residual,
+        )
+    )
+
+    with engines["endftables"].connect() as conn:
+        df = read_sql(stmt, conn)
+
+    columns = pd.MultiIndex.from_product([["value", "dvalue"], list(obs_types)])
+    matrix = (
+        df.drop_duplicates(["target", "obs_type"])
+        .pivot(index="target", columns="obs_type", values=["value", "dvalue"])
+        .reindex(columns=columns)
+        .astype(float)
+    )
+    matrix.columns.names = ["field", "obs_type"]
+    return matrix
+
+
+@instrumented
 def resonancetable_source_list(obs_type: str) -> list[str]:
     """Return distinct sources for a given obs_type, with 'selected' first."""
+    return _lookup(
+        "resonancetable_source_list", (obs_type,), lambda: _resonancetable_source_list(obs_type)
+    )
+
+
+def _resonancetable_source_list(obs_type: str) -> list[str]:
     stmt = (
         select(distinct(endf_reactions.c.evaluation))
         .select_from(_rt_join)
@@ -455,6 +940,7 @@ def resonancetable_source_list(obs_type: str) -> list[str]:
     return sources
 
 
+@instrumented
 def resonancetable_obs_type_list(data_type: str) -> list[str]:
     """
     Return the distinct obs_type values stored for a given data category.
@@ -481,3 +967,21 @@ def resonancetable_obs_type_list(data_type: str) -> list[str]:
     with engines["endftables"].connect() as conn:
         rows = conn.execute(stmt).fetchall()
     return [r[0] for r in rows]
+
+
+######## -------------------------------------- ########
+#    Asyncio counterparts
+#    (the blocking queries above run on the bounded
+#     executor of utilities/aio.py)
+######## -------------------------------------- ########
+
+async def lib_index_query_async(input_store):
+    return await run_query(lib_index_query, input_store)
+
+
+async def lib_data_query_async(input_store, ids, **kwargs):
+    return await run_query(lib_data_query, input_store, ids, **kwargs)
+
+
+async def resonancetable_index_query_async(input_store: dict) -> pd.DataFrame:
+    return await run_query(resonancetable_index_query, input_store)
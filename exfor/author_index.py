@@ -0,0 +1,145 @@
+import time
+import importlib
+import threading
+import numpy as np
+from collections import defaultdict
+from sqlalchemy import select
+
+try:
+    # from app.py
+    from config import engines
+except ImportError:
+    # for unit test
+    module_name = __name__.split(".")[0]
+    config = importlib.import_module(f"{module_name}.config")
+    engines = config.engines
+
+from exforparser.sql.models_core import exfor_bib
+
+from ..utilities.db import db_fingerprint
+
+
+######## -------------------------------------- ########
+#    In-memory author search index over exfor_bib
+#
+#    Case-insensitive substring search on first_author and authors,
+#    replacing LIKE '%...%' scans. Each field has a trigram inverted
+#    index (trigram -> sorted row positions); a query intersects the
+#    postings of its trigrams and verifies the candidates with a plain
+#    substring test. Queries shorter than 3 characters scan the
+#    lower-cased strings directly.
+######## -------------------------------------- ########
+
+_FIELDS = ("first_author", "authors")
+
+# Seconds between two fingerprint checks of the database
+AUTHOR_INDEX_CHECK_INTERVAL = 30.0
+
+
+def _trigrams(text: str) -> set:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class AuthorIndex:
+    """Trigram index of the author fields of exfor_bib, keyed by row position."""
+
+    def __init__(self, rows, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.entries = np.array([row.entry for row in rows], dtype=object)
+        self.texts = {}
+        self.postings = {}
+
+        for field in _FIELDS:
+            texts = [(getattr(row, field) or "").lower() for row in rows]
+            postings = defaultdict(list)
+            for pos, text in enumerate(texts):
+                for gram in _trigrams(text):
+                    postings[gram].append(pos)
+
+            self.texts[field] = texts
+            self.postings[field] = {
+                gram: np.array(positions, dtype=np.int32)
+                for gram, positions in postings.items()
+            }
+
+    @classmethod
+    def load(cls):
+        engine = engines["exfor"]
+        fingerprint = db_fingerprint(engine, exfor_bib)
+        stmt = select(exfor_bib.c.entry, *(exfor_bib.c[field] for field in _FIELDS))
+        with engine.connect() as conn:
+            rows = conn.execute(stmt).fetchall()
+        return cls(rows, fingerprint)
+
+    def positions(self, field: str, text: str) -> np.ndarray:
+        """Row positions whose field contains text, case-insensitively."""
+        needle = text.lower()
+        texts = self.texts[field]
+
+        if len(needle) < 3:
+            return np.array(
+                [pos for pos, value in enumerate(texts) if needle in value],
+                dtype=np.int32,
+            )
+
+        postings = self.postings[field]
+        empty = np.empty(0, dtype=np.int32)
+        lists = sorted(
+            (postings.get(gram, empty) for gram in _trigrams(needle)), key=len
+        )
+        candidates = lists[0]
+        for other in lists[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, other, assume_unique=True)
+
+        if len(needle) == 3:
+            return candidates
+        return np.array(
+            [pos for pos in candidates if needle in texts[pos]], dtype=np.int32
+        )
+
+    def search(self, first_author=None, authors=None) -> set:
+        """Entry numbers matching all given author substrings."""
+        result = None
+        for field, text in (("first_author", first_author), ("authors", authors)):
+            if not text:
+                continue
+            entries = set(self.entries[self.positions(field, text)])
+            result = entries if result is None else result & entries
+        return result if result is not None else set()
+
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_author_index() -> AuthorIndex:
+    """
+    Return the process-wide author index, building it on first use and
+    rebuilding it when the database fingerprint has changed (checked at most
+    every AUTHOR_INDEX_CHECK_INTERVAL seconds).
+    """
+    global _index, _checked_at
+
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < AUTHOR_INDEX_CHECK_INTERVAL:
+        return _index
+
+    with _lock:
+        if _index is not None and now - _checked_at < AUTHOR_INDEX_CHECK_INTERVAL:
+            return _index
+
+        if _index is None or _index.fingerprint != db_fingerprint(
+            engines["exfor"], exfor_bib
+        ):
+            _index = AuthorIndex.load()
+        _checked_at = now
+
+    return _index
+
+
+def author_entries(first_author=None, authors=None) -> set:
+    """Entries whose first_author / authors contain the given strings (case-insensitive)."""
+    return get_author_index().search(first_author=first_author, authors=authors)
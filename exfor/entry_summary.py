@@ -0,0 +1,183 @@
+import importlib
+from sqlalchemy import (
+    MetaData,
+    Table,
+    Column,
+    Float,
+    Integer,
+    String,
+    delete,
+    func,
+    inspect,
+    insert,
+    select,
+)
+
+try:
+    # from app.py
+    from config import engines
+except ImportError:
+    # for unit test
+    module_name = __name__.split(".")[0]
+    config = importlib.import_module(f"{module_name}.config")
+    engines = config.engines
+
+from exforparser.sql.models_core import exfor_indexes
+
+from ..utilities.cache import FingerprintCache
+from ..utilities.db import FINGERPRINT_MAX_AGE, db_fingerprint
+
+
+######## -------------------------------------- ########
+#    Materialised per-entry_id summary of exfor_indexes
+#
+#    entries_query and join_reaction_bib need the energy range of every
+#    entry_id, which otherwise means a GROUP BY over exfor_indexes on
+#    each search. exfor_entry_summary holds one precomputed row per
+#    entry_id. It is built next to the other tables with
+#    build_entry_summary() and kept current with refresh_entry_summary()
+#    after entries are added or changed. It is only used while its row and
+#    point totals match those of exfor_indexes (entry_summary_available),
+#    so a release loaded without a refresh falls back to the GROUP BY.
+######## -------------------------------------- ########
+
+metadata = MetaData()
+
+exfor_entry_summary = Table(
+    "exfor_entry_summary",
+    metadata,
+    Column("entry_id", String, primary_key=True),
+    Column("entry", String, index=True),
+    Column("en_inc_min", Float),
+    Column("en_inc_max", Float),
+    Column("points", Integer),
+    Column("index_rows", Integer),
+    Column("sf6_set", String),  # sorted distinct sf6, comma separated
+    Column("mt_set", String),  # sorted distinct mt, comma separated
+)
+
+# Entry ids replaced per transaction by refresh_entry_summary
+REFRESH_BATCH_SIZE = 500
+
+
+def _join_set(values) -> str:
+    return ",".join(sorted({str(v) for v in values if v is not None}))
+
+
+def _summary_rows(conn, entry_ids=None) -> dict:
+    """entry_id -> summary row computed from exfor_indexes (all, or the given ids)."""
+    where = [] if entry_ids is None else [exfor_indexes.c.entry_id.in_(list(entry_ids))]
+
+    agg = (
+        select(
+            exfor_indexes.c.entry_id,
+            func.min(exfor_indexes.c.entry).label("entry"),
+            func.min(exfor_indexes.c.en_inc_min).label("en_inc_min"),
+            func.max(exfor_indexes.c.en_inc_max).label("en_inc_max"),
+            func.sum(exfor_indexes.c.points).label("points"),
+            func.count().label("index_rows"),
+        )
+        .where(*where)
+        .group_by(exfor_indexes.c.entry_id)
+    )
+    rows = {row.entry_id: dict(row._mapping) for row in conn.execute(agg)}
+
+    sf6, mt = {}, {}
+    codes = select(exfor_indexes.c.entry_id, exfor_indexes.c.sf6, exfor_indexes.c.mt).where(*where).distinct()
+    for row in conn.execute(codes):
+        sf6.setdefault(row.entry_id, []).append(row.sf6)
+        mt.setdefault(row.entry_id, []).append(row.mt)
+
+    for entry_id, row in rows.items():
+        row["sf6_set"] = _join_set(sf6.get(entry_id, ()))
+        row["mt_set"] = _join_set(mt.get(entry_id, ()))
+    return rows
+
+
+def _replace(conn, entry_ids, rows: dict):
+    for start in range(0, len(entry_ids), REFRESH_BATCH_SIZE):
+        batch = entry_ids[start : start + REFRESH_BATCH_SIZE]
+        conn.execute(delete(exfor_entry_summary).where(exfor_entry_summary.c.entry_id.in_(batch)))
+        values = [rows[entry_id] for entry_id in batch if entry_id in rows]
+        if values:
+            conn.execute(insert(exfor_entry_summary), values)
+
+
+def build_entry_summary(engine=None) -> int:
+    """(Re)create exfor_entry_summary from exfor_indexes; returns the number of rows."""
+    engine = engine or engines["exfor"]
+    metadata.drop_all(engine, tables=[exfor_entry_summary])
+    metadata.create_all(engine, tables=[exfor_entry_summary])
+    with engine.begin() as conn:
+        rows = _summary_rows(conn)
+        _replace(conn, list(rows), rows)
+    _available.clear()
+    return len(rows)
+
+
+def refresh_entry_summary(entry_ids=None, engine=None) -> int:
+    """
+    Bring exfor_entry_summary up to date and return the number of entry_ids
+    rewritten. With entry_ids only those are recomputed (ids no longer in
+    exfor_indexes are removed). Without, the summary is compared with a fresh
+    aggregation of exfor_indexes and only the rows that differ are rewritten.
+    """
+    engine = engine or engines["exfor"]
+    if not inspect(engine).has_table(exfor_entry_summary.name):
+        return build_entry_summary(engine)
+
+    with engine.begin() as conn:
+        if entry_ids is not None:
+            entry_ids = sorted(set(entry_ids))
+            for start in range(0, len(entry_ids), REFRESH_BATCH_SIZE):
+                batch = entry_ids[start : start + REFRESH_BATCH_SIZE]
+                _replace(conn, batch, _summary_rows(conn, batch))
+        else:
+            rows = _summary_rows(conn)
+            stored = {
+                row.entry_id: dict(row._mapping)
+                for row in conn.execute(select(exfor_entry_summary))
+            }
+            entry_ids = sorted(
+                {entry_id for entry_id, row in rows.items() if stored.get(entry_id) != row}
+                | (stored.keys() - rows.keys())
+            )
+            _replace(conn, entry_ids, rows)
+
+    _available.clear()
+    return len(entry_ids)
+
+
+_available = FingerprintCache(max_entries=64)  # engine url -> bool
+
+
+def _summary_current(engine) -> bool:
+    """
+    True when exfor_entry_summary exists and covers the same number of
+    exfor_indexes rows and points as exfor_indexes itself.
+    """
+    if not inspect(engine).has_table(exfor_entry_summary.name):
+        return False
+
+    with engine.connect() as conn:
+        indexes = conn.execute(
+            select(func.count(), func.coalesce(func.sum(exfor_indexes.c.points), 0))
+        ).one()
+        summary = conn.execute(
+            select(
+                func.coalesce(func.sum(exfor_entry_summary.c.index_rows), 0),
+                func.coalesce(func.sum(exfor_entry_summary.c.points), 0),
+            )
+        ).one()
+    return tuple(indexes) == tuple(summary)
+
+
+def entry_summary_available(engine=None) -> bool:
+    """
+    True when exfor_entry_summary exists in the database of engine and is
+    current with exfor_indexes, i.e. was built or refreshed after the last
+    change of exfor_indexes.
+    """
+    engine = engine or engines["exfor"]
+    fingerprint = db_fingerprint(engine, exfor_indexes, max_age=FINGERPRINT_MAX_AGE)
+    return _available.get_or_compute(str(engine.url), fingerprint, lambda: _summary_current(engine))
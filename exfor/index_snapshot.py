@@ -0,0 +1,302 @@
+import time
+import importlib
+import threading
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from sqlalchemy import Integer, select
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import (
+    BinaryExpression,
+    BindParameter,
+    BooleanClauseList,
+    False_,
+    Null,
+    True_,
+)
+
+try:
+    # from app.py
+    from config import engines
+except ImportError:
+    # for unit test
+    module_name = __name__.split(".")[0]
+    config = importlib.import_module(f"{module_name}.config")
+    engines = config.engines
+
+from exforparser.sql.models_core import exfor_indexes
+
+from ..utilities.db import db_fingerprint
+
+
+######## -------------------------------------- ########
+#    In-process columnar snapshot of exfor_indexes
+#
+#    exfor_indexes is read-mostly, so the whole table is loaded once into
+#    numpy columns. String columns used in the index filters are dictionary
+#    encoded (int32 codes + uniques, code -1 for NULL) and the rows are hashed
+#    on (target, projectile, sf6). The SQLAlchemy conditions built by the
+#    _exfor_cond_* builders in queries.py are evaluated directly against
+#    these arrays, so the same filters apply with or without the snapshot.
+######## -------------------------------------- ########
+
+# Dictionary-encoded string columns
+_ENCODED_COLUMNS = (
+    "target",
+    "projectile",
+    "process",
+    "sf4",
+    "sf5",
+    "sf6",
+    "sf7",
+    "sf8",
+    "sf9",
+    "residual",
+    "main_facility_institute",
+    "main_facility_type",
+)
+
+# Columns of the (target, projectile, sf6) hash
+_HASH_COLUMNS = ("target", "projectile", "sf6")
+
+# Seconds between two fingerprint checks of the database
+SNAPSHOT_CHECK_INTERVAL = 30.0
+
+
+def _str_op(method, negate=False):
+    def op(values, value):
+        mask = np.fromiter(
+            (isinstance(v, str) and getattr(v, method)(value) for v in values),
+            dtype=bool,
+            count=len(values),
+        )
+        return ~mask if negate else mask
+
+    return op
+
+
+# SQL operator -> vectorised evaluation on (values, right-hand value)
+_OPERATORS = {
+    operators.eq: lambda values, value: values == value,
+    operators.ne: lambda values, value: values != value,
+    operators.ge: lambda values, value: values >= value,
+    operators.gt: lambda values, value: values > value,
+    operators.le: lambda values, value: values <= value,
+    operators.lt: lambda values, value: values < value,
+    operators.in_op: lambda values, value: np.isin(values, list(value)),
+    operators.not_in_op: lambda values, value: ~np.isin(values, list(value)),
+    operators.startswith_op: _str_op("startswith"),
+    operators.not_startswith_op: _str_op("startswith", negate=True),
+    operators.endswith_op: _str_op("endswith"),
+    operators.not_endswith_op: _str_op("endswith", negate=True),
+}
+
+
+def _right_value(element):
+    if isinstance(element, BindParameter):
+        return element.effective_value
+    if isinstance(element, Null):
+        return None
+    if isinstance(element, False_):
+        return False
+    if isinstance(element, True_):
+        return True
+    raise NotImplementedError(type(element).__name__)
+
+
+def _hashable(value):
+    return tuple(value) if isinstance(value, (list, tuple, set)) else value
+
+
+class ExforIndexSnapshot:
+    """Columnar copy of exfor_indexes that answers condition lists without SQL."""
+
+    def __init__(self, df: pd.DataFrame, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.columns = list(df.columns)
+        self.size = len(df)
+        self.Row = namedtuple("ExforIndexRow", self.columns)
+
+        self.codes = {}
+        self.uniques = {}
+        self.values = {}
+        self.nulls = {}
+
+        for name in self.columns:
+            if name in _ENCODED_COLUMNS:
+                codes, uniques = pd.factorize(df[name], use_na_sentinel=True)
+                self.codes[name] = codes.astype(np.int32)
+                self.uniques[name] = np.asarray(uniques, dtype=object)
+            else:
+                self.values[name] = df[name].to_numpy()
+                self.nulls[name] = df[name].isna().to_numpy()
+
+        self._integer_columns = {
+            c.name for c in exfor_indexes.columns if isinstance(c.type, Integer)
+        }
+        self._lookup = {
+            name: {v: i for i, v in enumerate(self.uniques[name])}
+            for name in self.uniques
+        }
+        # (column, operator, value) -> per-unique mask, extended by False for NULL
+        self._unique_masks = {}
+        self._hash = pd.DataFrame(
+            {name: self.codes[name] for name in _HASH_COLUMNS}
+        ).groupby(list(_HASH_COLUMNS), sort=False).indices
+
+    @classmethod
+    def load(cls):
+        engine = engines["exfor"]
+        fingerprint = db_fingerprint(engine, exfor_indexes)
+        with engine.connect() as conn:
+            df = pd.read_sql(select(exfor_indexes), conn)
+        return cls(df, fingerprint)
+
+    def _flatten(self, conditions):
+        for cond in conditions:
+            if isinstance(cond, BooleanClauseList) and cond.operator is operators.and_:
+                yield from self._flatten(cond.clauses)
+            else:
+                yield cond
+
+    def _candidates(self, conditions):
+        """Row positions from the (target, projectile, sf6) hash, or None if not all three are pinned."""
+        pinned = {}
+        for cond in conditions:
+            if (
+                isinstance(cond, BinaryExpression)
+                and cond.operator is operators.eq
+                and getattr(cond.left, "table", None) is exfor_indexes
+                and cond.left.key in _HASH_COLUMNS
+                and isinstance(cond.right, BindParameter)
+            ):
+                pinned[cond.left.key] = self._lookup[cond.left.key].get(
+                    cond.right.effective_value, -2
+                )
+
+        if len(pinned) < len(_HASH_COLUMNS):
+            return None
+
+        key = tuple(pinned[name] for name in _HASH_COLUMNS)
+        return self._hash.get(key, np.empty(0, dtype=np.intp))
+
+    def _evaluate(self, cond, pos):
+        if isinstance(cond, BooleanClauseList):
+            masks = [self._evaluate(c, pos) for c in cond.clauses]
+            if cond.operator is operators.and_:
+                return np.logical_and.reduce(masks)
+            if cond.operator is operators.or_:
+                return np.logical_or.reduce(masks)
+            raise NotImplementedError(cond.operator)
+
+        if not isinstance(cond, BinaryExpression):
+            raise NotImplementedError(type(cond).__name__)
+        if getattr(cond.left, "table", None) is not exfor_indexes:
+            raise NotImplementedError(str(cond.left))
+
+        name = cond.left.key
+        value = _right_value(cond.right)
+
+        if cond.operator in (operators.is_, operators.is_not):
+            if value is not None:
+                raise NotImplementedError(cond.operator)
+            if name in self.codes:
+                isnull = self.codes[name][pos] == -1
+            else:
+                isnull = self.nulls[name][pos]
+            return isnull if cond.operator is operators.is_ else ~isnull
+
+        op = _OPERATORS.get(cond.operator)
+        if op is None:
+            raise NotImplementedError(cond.operator)
+
+        # Comparisons with NULL are never true in SQL
+        if name in self.codes:
+            key = (name, cond.operator, _hashable(value))
+            per_unique = self._unique_masks.get(key)
+            if per_unique is None:
+                per_unique = np.append(op(self.uniques[name], value), False)
+                self._unique_masks[key] = per_unique
+            return per_unique[self.codes[name][pos]]
+
+        values = self.values[name][pos]
+        isnull = self.nulls[name][pos]
+        return np.asarray(op(values, value), dtype=bool) & ~isnull
+
+    def positions(self, conditions):
+        """Row positions matching all conditions (ANDed), as with select().where(*conditions)."""
+        conditions = list(self._flatten(conditions))
+        pos = self._candidates(conditions)
+        if pos is None:
+            pos = np.arange(self.size)
+
+        for cond in conditions:
+            if len(pos) == 0:
+                break
+            pos = pos[self._evaluate(cond, pos)]
+
+        return pos
+
+    def _cell(self, name, i):
+        if name in self.codes:
+            code = self.codes[name][i]
+            return None if code == -1 else self.uniques[name][code]
+        if self.nulls[name][i]:
+            return None
+        value = self.values[name][i]
+        if name in self._integer_columns:
+            return int(value)
+        return value.item() if isinstance(value, np.generic) else value
+
+    def rows(self, pos):
+        """Rows at positions as named tuples with the exfor_indexes column names."""
+        return [self.Row(*(self._cell(name, i) for name in self.columns)) for i in pos]
+
+    def query(self, conditions):
+        """Rows matching conditions, or None if a condition cannot be evaluated here."""
+        try:
+            pos = self.positions(conditions)
+        except NotImplementedError:
+            return None
+        return self.rows(pos)
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_index_snapshot() -> ExforIndexSnapshot:
+    """
+    Return the process-wide snapshot, loading it on first use and reloading it
+    when the database fingerprint has changed (checked at most every
+    SNAPSHOT_CHECK_INTERVAL seconds).
+    """
+    global _snapshot, _checked_at
+
+    now = time.monotonic()
+    if _snapshot is not None and now - _checked_at < SNAPSHOT_CHECK_INTERVAL:
+        return _snapshot
+
+    with _lock:
+        if _snapshot is not None and now - _checked_at < SNAPSHOT_CHECK_INTERVAL:
+            return _snapshot
+
+        if _snapshot is None or _snapshot.fingerprint != db_fingerprint(
+            engines["exfor"], exfor_indexes
+        ):
+            _snapshot = ExforIndexSnapshot.load()
+        _checked_at = now
+
+    return _snapshot
+
+
+def reload_index_snapshot() -> ExforIndexSnapshot:
+    """Force a reload of the snapshot, e.g. right after the database was updated."""
+    global _snapshot, _checked_at
+
+    with _lock:
+        _snapshot = ExforIndexSnapshot.load()
+        _checked_at = time.monotonic()
+
+    return _snapshot
@@ -1,10 +1,11 @@
+import os
 import sys
 import numpy as np
 import importlib
 import pandas as pd
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 from operator import getitem
-from sqlalchemy import select, and_, not_, func
+from sqlalchemy import MetaData, Table, select, and_, or_, not_, func, literal, union_all
 
 try:
     # from app.py
@@ -28,47 +29,145 @@ from ..utilities.util import (
     get_str_from_string,
     x4style_nuclide_expression,
 )
+from ..utilities.cache import FingerprintCache, frame_nbytes
+from ..utilities.db import FINGERPRINT_MAX_AGE, db_fingerprint, execute_cached
+from ..utilities.frames import downsample_minmax, compact_frame
+from ..utilities.aio import run_query
+from ..utilities.instrument import instrumented, frame_timer, db_timer, read_sql, instrument_engine
 from ..utilities.reaction import (
     convert_partial_reactionstr_to_inl,
     convert_reaction_to_exfor_style,
     convert_partial_reactionstr_to_inl,
 )
+from .index_snapshot import get_index_snapshot
+from .author_index import author_entries
+from .entry_summary import exfor_entry_summary, entry_summary_available
 
 
-def get_exfor_bib_table():
+# When True, exfor_index_query(_batch), index_query_fission and facility_query
+# evaluate their conditions against the in-process exfor_indexes snapshot
+# (see index_snapshot.py) instead of sending them to the database.
+USE_INDEX_SNAPSHOT = False
+
+
+# When True, index lookups run through the compiled statement cache of
+# utilities/db.py instead of building and compiling a new select() per call.
+USE_STATEMENT_CACHE = True
+
+# When True, entries_query resolves first_author/authors through the in-memory
+# trigram index (see author_index.py) instead of LIKE '%...%' on exfor_bib.
+USE_AUTHOR_INDEX = True
+
+# Above this many matching entries the author search goes back to LIKE, so that
+# the IN list stays well below the bind parameter limit of SQLite
+AUTHOR_INDEX_MAX_ENTRIES = 1000
+
+# When True and the table is current with exfor_indexes, entries_query and
+# join_reaction_bib read the energy range per entry_id from exfor_entry_summary
+# (see entry_summary.py) instead of aggregating exfor_indexes with GROUP BY on
+# every search.
+USE_ENTRY_SUMMARY = True
+
+# DB time of the instrumented query functions (see utilities/instrument.py)
+instrument_engine(engines["exfor"])
+
+
+def _index_rows(conditions) -> list:
+    """Rows of exfor_indexes matching all conditions, from the snapshot when enabled."""
+    if USE_INDEX_SNAPSHOT:
+        rows = get_index_snapshot().query(conditions)
+        if rows is not None:
+            return rows
+
+    with engines["exfor"].connect() as conn:
+        if USE_STATEMENT_CACHE:
+            return execute_cached(conn, "exfor_indexes", _select_indexes, conditions)
+        return conn.execute(_select_indexes(conditions)).fetchall()
+
+
+def _select_indexes(conditions):
+    return select(exfor_indexes).where(and_(*conditions))
+
+
+# Directory for on-disk copies of the full tables returned by get_exfor_*_table,
+# writable only by the processes sharing it (the files are unpickled).
+# None disables the disk tier; the in-memory tier below is always used.
+TABLE_CACHE_DIR = os.environ.get("EXFOR_TABLE_CACHE_DIR")
+
+# Size bound of the in-memory tier and of TABLE_CACHE_DIR, least recently used
+# tables are evicted first
+TABLE_CACHE_MAX_BYTES = 2 * 1024**3
+
+# table name -> DataFrame, see FingerprintCache
+_table_cache = FingerprintCache(
+    max_bytes=TABLE_CACHE_MAX_BYTES,
+    sizeof=frame_nbytes,
+    shared_dir=TABLE_CACHE_DIR,
+    shared_max_bytes=TABLE_CACHE_MAX_BYTES,
+)
+
+
+def _load_table(table_name):
     with engines["exfor"].connect() as connection:
-        df = pd.read_sql_table("exfor_bib", connection)
-        return df
+        with frame_timer():
+            return pd.read_sql_table(table_name, connection)
+
+
+# Tables with their primary key, for the max(pk) part of the fingerprint
+_mapped_tables = {t.name: t for t in (exfor_bib, exfor_reactions, exfor_indexes)}
+
+
+def _mapped_table(table_name):
+    """Table object of table_name; tables not in models_core are reflected once."""
+    if table_name not in _mapped_tables:
+        _mapped_tables[table_name] = Table(table_name, MetaData(), autoload_with=engines["exfor"])
+    return _mapped_tables[table_name]
+
+
+def _cached_table(table_name):
+    """
+    Whole-table DataFrame, served from memory, then disk, then the database.
+    Both tiers are invalidated by the database fingerprint. The returned frame
+    is a shallow copy, do not modify its values in place.
+    """
+    fingerprint = db_fingerprint(
+        engines["exfor"], _mapped_table(table_name), max_age=FINGERPRINT_MAX_AGE
+    )
+    return _table_cache.get_or_compute(
+        table_name, fingerprint, lambda: _load_table(table_name), label=table_name
+    )
+
+
+@instrumented
+def get_exfor_bib_table():
+    return _cached_table("exfor_bib")
 
 
+@instrumented
 def get_exfor_reference_table():
-    with engines["exfor"].connect() as connection:
-        df = pd.read_sql_table("exfor_references", connection)
-        return df
+    return _cached_table("exfor_references")
 
 
+@instrumented
 def get_exfor_experimental_condition_table():
-    with engines["exfor"].connect() as connection:
-        df = pd.read_sql_table("exfor_experimental_condition", connection)
-        return df
+    return _cached_table("exfor_experimental_condition")
 
 
+@instrumented
 def get_exfor_reactions_table():
-    with engines["exfor"].connect() as connection:
-        df = pd.read_sql_table("exfor_reactions", connection)
-        return df
+    return _cached_table("exfor_reactions")
 
 
+@instrumented
 def get_exfor_indexes_table():
-    with engines["exfor"].connect() as connection:
-        df = pd.read_sql_table("exfor_indexes", connection)
-        return df
+    return _cached_table("exfor_indexes")
 
 
 ########  -------------------------------------------- ##########
 ##  EXFOR entry queries for the dataexplorer/api/exfor/search  ##
 ########  -------------------------------------------- ##########
-def entries_query(**kwargs):
+def _entries_stmt(**kwargs):
+    """SELECT run by entries_query for the given search options."""
     queries = []
 
     types = kwargs.get("types")
@@ -107,11 +206,23 @@ def entries_query(**kwargs):
         reactions_exfor_format = [r.upper() for r in reaction]
         queries.append(exfor_reactions.c.process.in_(reactions_exfor_format))
 
-    if first_author:
-        queries.append(exfor_bib.c.first_author.like(f"%{first_author.capitalize()}%"))
+    entries = None
+    if (first_author or authors) and USE_AUTHOR_INDEX:
+        # resolve the authors in memory, push only the matching entries to SQL
+        entries = author_entries(first_author=first_author, authors=authors)
+        if len(entries) > AUTHOR_INDEX_MAX_ENTRIES:
+            # short strings match most of exfor_bib, LIKE beats a huge IN list
+            entries = None
+
+    if entries is not None:
+        queries.append(exfor_reactions.c.entry.in_(sorted(entries)))
 
-    if authors:
-        queries.append(exfor_bib.c.authors.like(f"%{authors.capitalize()}%"))
+    elif first_author or authors:
+        if first_author:
+            queries.append(exfor_bib.c.first_author.like(f"%{first_author.capitalize()}%"))
+
+        if authors:
+            queries.append(exfor_bib.c.authors.like(f"%{authors.capitalize()}%"))
 
     if sf4:
         queries.append(exfor_reactions.c.sf4 == sf4.upper())
@@ -133,6 +244,7 @@ def entries_query(**kwargs):
     if sf8:
         queries.append(exfor_reactions.c.sf8.in_(sf8))
 
+    ranges, energy = _energy_range_columns()
     stmt = (
         select(
             exfor_reactions.c.entry,
@@ -153,35 +265,77 @@ def entries_query(**kwargs):
             exfor_bib.c.main_doi,
             exfor_bib.c.main_facility_institute,
             exfor_bib.c.main_facility_type,
-            func.min(exfor_indexes.c.en_inc_min).label("en_inc_min"),
-            func.max(exfor_indexes.c.en_inc_max).label("en_inc_max"),
+            *energy,
         )
         .select_from(
             exfor_reactions.join(
                 exfor_bib, exfor_reactions.c.entry == exfor_bib.c.entry, isouter=True
-            ).join(
-                exfor_indexes,
-                exfor_indexes.c.entry_id == exfor_reactions.c.entry_id,
-                isouter=True,
-            )
+            ).join(ranges, ranges.c.entry_id == exfor_reactions.c.entry_id, isouter=True)
         )
         .where(and_(*queries))
-        .group_by(exfor_reactions.c.entry_id)
         .order_by(exfor_bib.c.year.desc())
     )
+    if ranges is exfor_indexes:
+        stmt = stmt.group_by(exfor_reactions.c.entry_id)
+    return stmt
+
+
+def _use_entry_summary() -> bool:
+    return USE_ENTRY_SUMMARY and entry_summary_available()
+
+
+def _energy_range_columns() -> tuple:
+    """
+    Table joined on entry_id for the energy range, and its en_inc_min/en_inc_max
+    columns: exfor_entry_summary, or aggregates over exfor_indexes (needs GROUP BY).
+    """
+    if _use_entry_summary():
+        return exfor_entry_summary, [
+            exfor_entry_summary.c.en_inc_min,
+            exfor_entry_summary.c.en_inc_max,
+        ]
+    return exfor_indexes, [
+        func.min(exfor_indexes.c.en_inc_min).label("en_inc_min"),
+        func.max(exfor_indexes.c.en_inc_max).label("en_inc_max"),
+    ]
+
+
+@instrumented
+def entries_query(**kwargs):
+    stmt = _entries_stmt(**kwargs)
 
     with engines["exfor"].connect() as conn:
-        df = pd.read_sql(stmt, conn)
+        df = read_sql(stmt, conn)
 
     return df
 
 
+@instrumented
 def facility_query(facility_code, facility_type):
     queries = [
         exfor_indexes.c.main_facility_institute == facility_code,
         exfor_indexes.c.main_facility_type == facility_type.upper(),
     ]
 
+    if USE_INDEX_SNAPSHOT:
+        rows = get_index_snapshot().query(queries)
+        with frame_timer():
+            index_df = pd.DataFrame(rows, columns=exfor_indexes.columns.keys())
+        stmt = select(exfor_bib).where(exfor_bib.c.entry.in_(set(index_df["entry"])))
+        with engines["exfor"].connect() as conn:
+            bib_df = read_sql(stmt, conn)
+
+        bib_df = (
+            bib_df.set_index(bib_df["entry"])
+            .reindex(index_df["entry"])
+            .reset_index(drop=True)
+        )
+        # same labels as the SQL result, which suffixes duplicated names with _1
+        bib_df.columns = [
+            f"{col}_1" if col in index_df.columns else col for col in bib_df.columns
+        ]
+        return pd.concat([index_df, bib_df], axis=1).drop_duplicates()
+
     stmt = (
         select(exfor_indexes, exfor_bib)
         .select_from(
@@ -194,7 +348,7 @@ def facility_query(facility_code, facility_type):
     )
 
     with engines["exfor"].connect() as conn:
-        df = pd.read_sql(stmt, conn)
+        df = read_sql(stmt, conn)
 
     return df
 
@@ -326,7 +480,13 @@ EXFOR_OBS_TYPE_CONFIG: dict = {
 }
 
 
-def exfor_index_query(input_store) -> dict:
+# Maximum number of per-request SELECTs combined into one UNION ALL by
+# exfor_index_query_batch (SQLite's default SQLITE_MAX_COMPOUND_SELECT is 500).
+INDEX_QUERY_BATCH_SIZE = 200
+
+
+def _exfor_index_conditions(input_store) -> list:
+    """Conditions on exfor_indexes for one page-level input_store."""
     obs_type = input_store.get("obs_type").upper()
     config = EXFOR_OBS_TYPE_CONFIG[obs_type]
 
@@ -353,34 +513,40 @@ def exfor_index_query(input_store) -> dict:
             queries.append(exfor_indexes.c.sf8 == None)
 
     queries.append(exfor_indexes.c.sf6 == config["sf6"].upper())
-    stmt = select(exfor_indexes).where(and_(*queries))
+    return queries
+
+
+# exfor_indexes columns returned per entry_id by exfor_index_query
+_INDEX_ENTRY_FIELDS = (
+    "level_num",
+    "en_inc_min",
+    "en_inc_max",
+    "points",
+    "x4_code",
+    "sf4",
+    "sf5",
+    "sf6",
+    "sf7",
+    "sf8",
+    "sf9",
+    "mt",
+    "mf",
+)
+
+
+def _exfor_index_entry(row, prefix="") -> dict:
+    entry = {name: getattr(row, prefix + name) for name in _INDEX_ENTRY_FIELDS}
+    for name in ("en_inc_min", "en_inc_max"):
+        entry[name] = (entry[name] / 1e6) if entry[name] is not None else np.nan
+    return entry
 
-    with engines["exfor"].connect() as conn:
-        result = conn.execute(stmt).fetchall()
+
+@instrumented
+def exfor_index_query(input_store) -> dict:
+    result = _index_rows(_exfor_index_conditions(input_store))
 
     entries = (
-        {
-            row.entry_id: {
-                "level_num": row.level_num,
-                "en_inc_min": (
-                    (row.en_inc_min / 1e6) if row.en_inc_min is not None else np.nan
-                ),
-                "en_inc_max": (
-                    (row.en_inc_max / 1e6) if row.en_inc_max is not None else np.nan
-                ),
-                "points": row.points,
-                "x4_code": row.x4_code,
-                "sf4": row.sf4,
-                "sf5": row.sf5,
-                "sf6": row.sf6,
-                "sf7": row.sf7,
-                "sf8": row.sf8,
-                "sf9": row.sf9,
-                "mt": row.mt,
-                "mf": row.mf,
-            }
-            for row in result
-        }
+        {row.entry_id: _exfor_index_entry(row) for row in result}
         if result
         else {}
     )
@@ -388,6 +554,50 @@ def exfor_index_query(input_store) -> dict:
     return entries
 
 
+@instrumented
+def exfor_index_query_batch(input_stores) -> dict:
+    """
+    Run exfor_index_query for many input_stores over one connection.
+
+    The per-request SELECTs are tagged with the request position and combined
+    with UNION ALL, INDEX_QUERY_BATCH_SIZE requests per statement.
+
+    input_stores : list of input_store dicts, or dict {key: input_store}
+    Returns {key: {entry_id: {...}}} with the same entry dicts as exfor_index_query,
+    keyed by list position or by the keys of the given dict.
+    """
+    if isinstance(input_stores, dict):
+        requests = list(input_stores.items())
+    else:
+        requests = list(enumerate(input_stores))
+
+    results = {key: {} for key, _ in requests}
+
+    if USE_INDEX_SNAPSHOT:
+        for key, input_store in requests:
+            results[key] = exfor_index_query(input_store)
+        return results
+
+    with engines["exfor"].connect() as conn:
+        for start in range(0, len(requests), INDEX_QUERY_BATCH_SIZE):
+            selects = [
+                select(literal(pos).label("request_pos"), exfor_indexes).where(
+                    and_(*_exfor_index_conditions(input_store))
+                )
+                for pos, (_, input_store) in enumerate(
+                    requests[start : start + INDEX_QUERY_BATCH_SIZE], start
+                )
+            ]
+            stmt = union_all(*selects) if len(selects) > 1 else selects[0]
+
+            for row in conn.execute(stmt):
+                key = requests[row.request_pos][0]
+                results[key][row.entry_id] = _exfor_index_entry(row)
+
+    return results
+
+
+@instrumented
 def get_entry_bib(entries):
     stmt = select(exfor_bib).where(exfor_bib.c.entry.in_(entries))
 
@@ -407,24 +617,27 @@ def get_entry_bib(entries):
     )
 
 
+@instrumented
 def entry_query_by_id(entries):
     stmt = select(exfor_bib).where(exfor_bib.c.entry.in_(entries))
 
     with engines["exfor"].connect() as connection:
-        df = pd.read_sql(stmt, connection)
+        df = read_sql(stmt, connection)
 
     return df
 
 
+@instrumented
 def reaction_query_by_id(entries):
     stmt = select(exfor_reactions).where(exfor_reactions.c.entry.in_(entries))
 
     with engines["exfor"].connect() as connection:
-        df = pd.read_sql(stmt, connection)
+        df = read_sql(stmt, connection)
 
     return df
 
 
+@instrumented
 def index_query_by_id(entries):
     queries = exfor_indexes.entry.in_(tuple(entries))
 
@@ -432,19 +645,44 @@ def index_query_by_id(entries):
 
     with engines["exfor"].connect() as connection:
         result = connection.execute(stmt)
-        df = pd.DataFrame(result.fetchall(), columns=result.keys())
+        with db_timer():
+            rows = result.fetchall()
+        with frame_timer():
+            df = pd.DataFrame(rows, columns=result.keys())
 
     return df
 
 
-def data_query(input_store, entids):
+# Rows fetched per cursor partition by the streaming path of data_query.
+DATA_QUERY_CHUNK_SIZE = 50000
+
+# Numpy dtypes of the numeric exfor_data columns, in both paths of data_query.
+# Columns not listed here (entry_id, residual, isomer, ...) are kept as objects.
+# Integer-like columns are float64 so that NULL can be stored as NaN.
+_EXFOR_DATA_DTYPES: dict = {
+    "en_inc": np.float64,
+    "den_inc": np.float64,
+    "level_num": np.float64,
+    "charge": np.float64,
+    "mass": np.float64,
+    "data": np.float64,
+    "ddata": np.float64,
+    "angle": np.float64,
+    "dangle": np.float64,
+    "e_out": np.float64,
+    "de_out": np.float64,
+}
+
+
+def _data_query_columns(input_store) -> tuple[list, list]:
+    """exfor_data columns selected for the obs_type, and the filters other than entry_id."""
     obs_type = input_store.get("obs_type", "").upper()
     level_num = input_store.get("level_num")
 
     if obs_type == "XS":
         obs_type = "SIG"
 
-    filters = [exfor_data.c.entry_id.in_(tuple(entids))]
+    filters = []
 
     if level_num is not None:
         filters.append(exfor_data.c.level_num == level_num)
@@ -524,11 +762,187 @@ def data_query(input_store, entids):
         # fallback: fetch all columns (not recommended)
         columns = [exfor_data]
 
-    stmt = select(*columns).where(and_(*filters))
+    return columns, filters
+
+
+def _entries_in_window(entids, en_min, en_max) -> list:
+    """
+    entids whose exfor_indexes energy range overlaps [en_min, en_max] (MeV).
+    Entries without a recorded range, or without index rows, are kept.
+    """
+    in_entids = exfor_indexes.c.entry_id.in_(tuple(entids))
+
+    rows = None
+    if USE_INDEX_SNAPSHOT:
+        rows = get_index_snapshot().query([in_entids])
+    if rows is None:
+        stmt = select(
+            exfor_indexes.c.entry_id,
+            exfor_indexes.c.en_inc_min,
+            exfor_indexes.c.en_inc_max,
+        ).where(in_entids)
+        with engines["exfor"].connect() as conn:
+            rows = conn.execute(stmt).fetchall()
+
+    # exfor_indexes stores eV
+    lower = en_min * 1e6 if en_min is not None else None
+    upper = en_max * 1e6 if en_max is not None else None
+
+    indexed, inside = set(), set()
+    for row in rows:
+        indexed.add(row.entry_id)
+        below = (
+            lower is not None and row.en_inc_max is not None and row.en_inc_max < lower
+        )
+        above = (
+            upper is not None and row.en_inc_min is not None and row.en_inc_min > upper
+        )
+        if not (below or above):
+            inside.add(row.entry_id)
+
+    return [entid for entid in entids if entid in inside or entid not in indexed]
+
+
+def _data_query_stmt(input_store, entids, en_min=None, en_max=None):
+    columns, filters = _data_query_columns(input_store)
+
+    # energy window in MeV, exfor_data stores eV
+    if en_min is not None or en_max is not None:
+        entids = _entries_in_window(entids, en_min, en_max)
+    if en_min is not None:
+        filters.append(exfor_data.c.en_inc >= en_min * 1e6)
+    if en_max is not None:
+        filters.append(exfor_data.c.en_inc <= en_max * 1e6)
+
+    return select(*columns).where(
+        and_(exfor_data.c.entry_id.in_(tuple(entids)), *filters)
+    )
+
+
+def _fetch_columns(conn, stmt, chunk_size=DATA_QUERY_CHUNK_SIZE) -> dict:
+    """
+    Stream the rows of stmt in chunks of chunk_size into preallocated typed
+    numpy columns. The buffers grow geometrically if the result is larger than
+    the current capacity. Returns {column name: array} trimmed to the row count
+    (views, no copy).
+    """
+    result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+    names = list(result.keys())
+    dtypes = [_EXFOR_DATA_DTYPES.get(name, object) for name in names]
+
+    capacity = chunk_size
+    arrays = [np.empty(capacity, dtype=dtype) for dtype in dtypes]
+    size = 0
+
+    for rows in result.partitions(chunk_size):
+        n = len(rows)
+        if size + n > capacity:
+            capacity = max(capacity * 2, size + n)
+            grown = [np.empty(capacity, dtype=dtype) for dtype in dtypes]
+            for new, old in zip(grown, arrays):
+                new[:size] = old[:size]
+            arrays = grown
+
+        for array, values in zip(arrays, zip(*rows)):
+            array[size : size + n] = values
+        size += n
+
+    return {name: array[:size] for name, array in zip(names, arrays)}
+
+
+@instrumented
+def data_query_arrays(
+    input_store, entids, chunk_size=DATA_QUERY_CHUNK_SIZE, en_min=None, en_max=None
+) -> dict:
+    """
+    Same selection as data_query, but the cursor is streamed straight into
+    typed numpy columns instead of going through Row objects.
+    Returns {column name: np.ndarray} with en_inc/den_inc converted to MeV in place.
+    """
+    stmt = _data_query_stmt(input_store, entids, en_min, en_max)
+
+    with engines["exfor"].connect() as conn:
+        arrays = _fetch_columns(conn, stmt, chunk_size)
+
+    _arrays_to_mev(arrays)
+    return arrays
+
+
+def _arrays_to_mev(arrays: dict):
+    ## Convert eV to MeV
+    for col in ("en_inc", "den_inc"):
+        if col in arrays:
+            arrays[col] /= 1e6
+
+
+# Series and x axis used by the max_points downsampling of data_query, per obs_type:
+# (columns identifying one plotted series, x column). The y column is always data.
+_DOWNSAMPLE_AXES: dict = {
+    "FY": (["entry_id", "en_inc"], "mass"),
+    "DA": (["entry_id", "en_inc"], "angle"),
+    "DE": (["entry_id", "en_inc"], "e_out"),
+}
+
+
+def downsample_data(input_store, df, max_points):
+    """
+    Reduce each plotted series of a data_query result to about max_points
+    points with a min/max-per-bin pass, keeping ddata and the other columns
+    of the retained points.
+    """
+    obs_type = input_store.get("obs_type", "").upper()
+    by, x = _DOWNSAMPLE_AXES.get(obs_type, (["entry_id"], "en_inc"))
+    return downsample_minmax(df, x=x, y="data", by=by, max_points=max_points)
+
+
+@instrumented
+def data_query(
+    input_store,
+    entids,
+    stream=False,
+    chunk_size=DATA_QUERY_CHUNK_SIZE,
+    max_points=None,
+    en_min=None,
+    en_max=None,
+    compact=False,
+):
+    """
+    Return the EXFOR data points of entids as a DataFrame, energies in MeV.
+    With stream=True the rows are fetched via data_query_arrays and the
+    DataFrame is built on top of those arrays without copying them.
+    With max_points each series is downsampled for plotting (see
+    downsample_data); the default None returns the full resolution.
+    en_min/en_max (MeV) restrict the incident energy in SQL, and entries whose
+    exfor_indexes range lies entirely outside the window are not queried.
+    With compact=True the columns get smaller dtypes (see compact_frame),
+    df.attrs["bytes_saved"] reports the difference.
+    """
+    # downsampling reads the points streamed
+    df = _data_query(input_store, entids, stream or bool(max_points), chunk_size, en_min, en_max)
+    if max_points:
+        df = downsample_data(input_store, df, max_points)
+
+    return compact_frame(df) if compact else df
+
+
+def _data_query(input_store, entids, stream, chunk_size, en_min, en_max):
+    """data_query at full resolution, inside the instrumented call."""
+    if stream:
+        return pd.DataFrame(
+            data_query_arrays(input_store, entids, chunk_size, en_min, en_max),
+            copy=False,
+        )
+
+    stmt = _data_query_stmt(input_store, entids, en_min, en_max)
 
     with engines["exfor"].connect() as conn:
         result = conn.execute(stmt)
-        df = pd.DataFrame(result.fetchall(), columns=result.keys())
+        with db_timer():
+            rows = result.fetchall()
+        with frame_timer():
+            df = pd.DataFrame(rows, columns=result.keys())
+            # same dtypes as the streaming path, e.g. float64 NaN for all-NULL columns
+            df = df.astype({name: dtype for name, dtype in _EXFOR_DATA_DTYPES.items() if name in df})
 
         ## Convert eV to MeV
         df["en_inc"] = df["en_inc"] / 1e6  # eV to MeV
@@ -537,6 +951,56 @@ def data_query(input_store, entids):
     return df
 
 
+@instrumented
+def exfor_reaction_query(input_store, chunk_size=DATA_QUERY_CHUNK_SIZE):
+    """
+    exfor_index_query and data_query in one statement: the index conditions
+    are joined directly to exfor_data, which avoids a second round trip and
+    a large entry_id IN (...) list for well-measured reactions.
+
+    Returns (entries, df) as exfor_index_query(input_store) and
+    data_query(input_store, entries, stream=True) would.
+    """
+    columns, filters = _data_query_columns(input_store)
+    index_columns = [
+        exfor_indexes.c[name].label(f"index_{name}")
+        for name in ("entry_id",) + _INDEX_ENTRY_FIELDS
+    ]
+
+    stmt = (
+        select(*index_columns, *columns)
+        .select_from(
+            exfor_indexes.outerjoin(
+                exfor_data,
+                and_(exfor_data.c.entry_id == exfor_indexes.c.entry_id, *filters),
+            )
+        )
+        .where(and_(*_exfor_index_conditions(input_store)))
+    )
+
+    with engines["exfor"].connect() as conn:
+        arrays = _fetch_columns(conn, stmt, chunk_size)
+
+    Row = namedtuple("IndexRow", [col.name for col in index_columns])
+    index_ids = arrays["index_entry_id"]
+    _, first = np.unique(index_ids, return_index=True)
+    entries = {}
+    for i in sorted(first):
+        row = Row(*(arrays[col.name][i] for col in index_columns))
+        entries[row.index_entry_id] = _exfor_index_entry(row, prefix="index_")
+
+    # index rows without any data point come back once with NULL data columns
+    has_data = np.array([v is not None for v in arrays["entry_id"]], dtype=bool)
+    data = {
+        name: array[has_data]
+        for name, array in arrays.items()
+        if not name.startswith("index_")
+    }
+    _arrays_to_mev(data)
+
+    return entries, pd.DataFrame(data, copy=False)
+
+
 ######## -------------------------------------- ########
 #    Queries for FY
 ######## -------------------------------------- ########
@@ -554,10 +1018,19 @@ def fy_branch(branch):
         return [branch]
 
 
-def index_query_fission(obs_type, elem, mass, reaction, branch, lower, upper):
-    sf4 = None
-    sf5 = None
-    sf6 = None
+# Fission observables handled by index_query_fission:
+#   branch -> sf4 (None: any), accepted sf5 and sf6 values in exfor_indexes
+FISSION_BRANCH_CONFIG: dict = {
+    "nu_n": {"sf4": None,    "sf5": ["PR"], "sf6": ["NU"]},
+    "nu_g": {"sf4": "0-G-0", "sf5": ["PR"], "sf6": ["FY"]},
+    "dn":   {"sf4": None,    "sf5": ["DL"], "sf6": ["NU"]},
+    "pfns": {"sf4": None,    "sf5": ["PR"], "sf6": ["NU/DE"]},
+    "pfgs": {"sf4": "0-G-0", "sf5": ["PR"], "sf6": ["FY/DE"]},
+}
+
+
+def _fission_conditions(elem, mass, reaction, lower, upper) -> list:
+    """Conditions shared by all fission branches, energy window included when given."""
     target = x4style_nuclide_expression(elem, mass)
 
     queries = [
@@ -566,133 +1039,351 @@ def index_query_fission(obs_type, elem, mass, reaction, branch, lower, upper):
         exfor_indexes.c.arbitrary_data == False,
     ]
 
-    if branch == "nu_n":
-        sf5 = ["PR"]
-        sf6 = ["NU"]
-    elif branch == "nu_g":
-        sf4 = "0-G-0"
-        sf5 = ["PR"]
-        sf6 = ["FY"]
-    elif branch == "dn":
-        sf5 = ["DL"]
-        sf6 = ["NU"]
-    elif branch == "pfns":
-        sf5 = ["PR"]
-        sf6 = ["NU/DE"]
-    elif branch == "pfgs":
-        sf4 = "0-G-0"
-        sf5 = ["PR"]
-        sf6 = ["FY/DE"]
-    else:
+    if lower is not None:
+        queries.append(exfor_indexes.c.en_inc_min >= lower)
+
+    if upper is not None:
+        queries.append(exfor_indexes.c.en_inc_max <= upper)
+
+    return queries
+
+
+def _fission_branch_conditions(branch) -> list:
+    config = FISSION_BRANCH_CONFIG[branch]
+    queries = []
+
+    if config["sf4"]:
+        queries.append(exfor_indexes.c.sf4 == config["sf4"])
+
+    queries.append(exfor_indexes.c.sf5.in_(tuple(config["sf5"])))
+    queries.append(exfor_indexes.c.sf6.in_(tuple(config["sf6"])))
+
+    return queries
+
+
+def _fission_entry(row) -> dict:
+    return {
+        "en_inc_min": row.en_inc_min,
+        "en_inc_max": row.en_inc_max,
+        "points": row.points,
+        "sf5": row.sf5,
+        "sf8": row.sf8,
+        "x4_code": row.x4_code,
+    }
+
+
+@instrumented
+def index_query_fission(obs_type, elem, mass, reaction, branch, lower, upper):
+    if branch not in FISSION_BRANCH_CONFIG:
         ## to avoid large query
         return None, None
 
-    if sf4:
-        queries.append(exfor_indexes.c.sf4 == sf4)
+    if not (lower and upper):
+        lower = upper = None
 
-    if sf5:
-        queries.append(exfor_indexes.c.sf5.in_(tuple(sf5)))
+    rows = _index_rows(
+        _fission_conditions(elem, mass, reaction, lower, upper)
+        + _fission_branch_conditions(branch)
+    )
 
-    if sf6:
-        queries.append(exfor_indexes.c.sf6.in_(tuple(sf6)))
+    entids = {row.entry_id: _fission_entry(row) for row in rows}
+    # one entry per EXFOR entry, in row order, as in index_query_fission_bulk
+    entries = list(dict.fromkeys(row.entry for row in rows))
 
-    if lower and upper:
-        # lower, upper = energy_range_conversion(energy_range)
-        queries.append(exfor_indexes.c.en_inc_min >= lower)
-        queries.append(exfor_indexes.c.en_inc_max <= upper)
+    return entids, entries
 
-    stmt = select(exfor_indexes).where(*queries)
 
-    with engines["exfor"].connect() as conn:
-            entries = conn.execute(stmt).fetchall()
-
-    entids = {}
-
-    for ent in entries:
-        entids[ent.entry_id] = {
-            "en_inc_min": ent.en_inc_min,
-            "en_inc_max": ent.en_inc_max,
-            "points": ent.points,
-            "sf5": ent.sf5,
-            "sf8": ent.sf8,
-            "x4_code": ent.x4_code,
-        }
-        entries += [ent.entry]
+@instrumented
+def index_query_fission_bulk(elem, mass, reaction, lower=None, upper=None) -> dict:
+    """
+    All branches of FISSION_BRANCH_CONFIG for one target and process in a
+    single query, with the optional energy window applied in SQL.
 
-    return entids, entries
+    Returns {branch: {"entids": {entry_id: {...}}, "entries": [entry, ...]}}
+    with the same per-entry dicts as index_query_fission; every branch is
+    present, possibly empty.
+    """
+    branches = or_(
+        *[
+            and_(*_fission_branch_conditions(branch))
+            for branch in FISSION_BRANCH_CONFIG
+        ]
+    )
+    rows = _index_rows(
+        _fission_conditions(elem, mass, reaction, lower, upper) + [branches]
+    )
+
+    # (sf5, sf6) -> [(branch, sf4)] to classify each row once
+    lookup = {}
+    for branch, config in FISSION_BRANCH_CONFIG.items():
+        for sf5 in config["sf5"]:
+            for sf6 in config["sf6"]:
+                lookup.setdefault((sf5, sf6), []).append((branch, config["sf4"]))
+
+    result = {
+        branch: {"entids": {}, "entries": []} for branch in FISSION_BRANCH_CONFIG
+    }
+    for row in rows:
+        for branch, sf4 in lookup.get((row.sf5, row.sf6), ()):
+            if sf4 is None or row.sf4 == sf4:
+                result[branch]["entids"][row.entry_id] = _fission_entry(row)
+                result[branch]["entries"].append(row.entry)
+
+    for branch_result in result.values():
+        branch_result["entries"] = list(dict.fromkeys(branch_result["entries"]))
+
+    return result
 
 
 ########  -------------------------------------- ##########
 ##         Join table for AGGrid
 ########  -------------------------------------- ##########
 
-def join_reaction_bib():
-    stmt = (
-        select(
-            exfor_reactions.c.entry,
-            exfor_reactions.c.entry_id,
-            exfor_reactions.c.target,
-            exfor_reactions.c.projectile,
-            exfor_reactions.c.process,
-            exfor_reactions.c.sf4,
-            exfor_reactions.c.sf6,
-            exfor_bib.c.first_author,
-            exfor_bib.c.first_author_institute,
-            exfor_bib.c.title,
-            exfor_bib.c.main_reference,
-            exfor_bib.c.main_doi,
-            exfor_bib.c.authors,
-            exfor_bib.c.year,
-            exfor_bib.c.main_facility_institute,
-            exfor_bib.c.main_facility_type,
-            func.min(exfor_indexes.c.en_inc_min).label("en_inc_min"),
-            func.max(exfor_indexes.c.en_inc_max).label("en_inc_max"),
+# Default page size of iter_join_reaction_bib / iter_join_index_bib
+GRID_CHUNK_SIZE = 10000
+
+# Operators accepted in the (column, op, value) filters of the grid joins
+_GRID_FILTER_OPS = {
+    "==": lambda col, value: col == value,
+    "!=": lambda col, value: col != value,
+    ">": lambda col, value: col > value,
+    ">=": lambda col, value: col >= value,
+    "<": lambda col, value: col < value,
+    "<=": lambda col, value: col <= value,
+    "in": lambda col, value: col.in_(list(value)),
+    "contains": lambda col, value: col.contains(value, autoescape=True),
+    "startswith": lambda col, value: col.startswith(value, autoescape=True),
+}
+
+# Sort key of the default grid order (year desc, entry_id); NULL years sort last
+_grid_year = func.coalesce(exfor_bib.c.year, 0)
+
+
+def _grid_filters(columns: dict, filters) -> tuple[list, list]:
+    """
+    Split (column, op, value) filters into WHERE and HAVING conditions.
+    Only the labels of the selected columns can be filtered on.
+    """
+    where, having = [], []
+    for name, op, value in filters or []:
+        if name not in columns:
+            raise ValueError(f"Unknown grid column: {name}")
+        if op not in _GRID_FILTER_OPS:
+            raise ValueError(f"Unknown grid filter operator: {op}")
+        col = columns[name]
+        cond = _GRID_FILTER_OPS[op](col, value)
+        (having if name in ("en_inc_min", "en_inc_max") else where).append(cond)
+    return where, having
+
+
+def _grid_order(columns: dict, sort) -> list:
+    """ORDER BY for [(column, "asc"|"desc"), ...]; None gives year desc, entry_id."""
+    if not sort:
+        return [_grid_year.desc(), columns["entry_id"]]
+
+    order = []
+    for name, direction in sort:
+        if name not in columns:
+            raise ValueError(f"Unknown grid column: {name}")
+        col = columns[name]
+        order.append(col.desc() if direction.lower() == "desc" else col.asc())
+    return order + [columns["entry_id"]]
+
+
+def _grid_after(entry_id_col, after) -> list:
+    """Keyset condition for the default order, after = (year, entry_id) of the last row seen."""
+    if after is None:
+        return []
+    year, entry_id = after
+    year = 0 if year is None else year
+    return [
+        or_(
+            _grid_year < year,
+            and_(_grid_year == year, entry_id_col > entry_id),
         )
+    ]
+
+
+def grid_cursor(df):
+    """Keyset cursor (year, entry_id) of the last row of a grid page, or None if empty."""
+    if df.empty:
+        return None
+    last = df.iloc[-1]
+    year = int(last["year"]) if pd.notna(last["year"]) else None
+    return (year, str(last["entry_id"]))
+
+
+def _iter_grid(query, chunk_size, sort, filters):
+    """
+    Yield pages of query(...) by keyset for the default order, by offset otherwise.
+    Keyset pages hold chunk_size entry_ids, offset pages chunk_size rows.
+    """
+    after, offset = None, 0
+    while True:
+        if sort:
+            df = query(page_size=chunk_size, offset=offset, sort=sort, filters=filters)
+            offset += chunk_size
+            size = len(df)
+        else:
+            df = query(page_size=chunk_size, after=after, filters=filters)
+            after = grid_cursor(df)
+            size = df["entry_id"].nunique()
+
+        if df.empty:
+            return
+        yield df
+        if size < chunk_size:
+            return
+
+
+@instrumented
+def join_reaction_bib(page_size=None, after=None, offset=None, sort=None, filters=None):
+    """
+    One row per entry_id of exfor_reactions joined with exfor_bib and the
+    energy range from exfor_indexes, ordered by year desc, entry_id.
+
+    page_size : rows per page, None returns the whole catalogue
+    after     : keyset cursor (year, entry_id) of the previous page, see grid_cursor;
+                only valid with the default order
+    offset    : rows to skip, for pages of a custom sort
+    sort      : [(column, "asc"|"desc"), ...], server-side sort
+    filters   : [(column, op, value), ...] with op in _GRID_FILTER_OPS
+    """
+    ranges, energy = _energy_range_columns()
+    columns = [
+        exfor_reactions.c.entry,
+        exfor_reactions.c.entry_id,
+        exfor_reactions.c.target,
+        exfor_reactions.c.projectile,
+        exfor_reactions.c.process,
+        exfor_reactions.c.sf4,
+        exfor_reactions.c.sf6,
+        exfor_bib.c.first_author,
+        exfor_bib.c.first_author_institute,
+        exfor_bib.c.title,
+        exfor_bib.c.main_reference,
+        exfor_bib.c.main_doi,
+        exfor_bib.c.authors,
+        exfor_bib.c.year,
+        exfor_bib.c.main_facility_institute,
+        exfor_bib.c.main_facility_type,
+        *energy,
+    ]
+    by_name = {col.name: col for col in columns}
+    where, having = _grid_filters(by_name, filters)
+
+    if after is not None and sort:
+        raise ValueError("Keyset pagination (after) requires the default order")
+
+    stmt = (
+        select(*columns)
         .select_from(
             exfor_reactions
             .join(exfor_bib, exfor_reactions.c.entry == exfor_bib.c.entry)
-            .join(exfor_indexes, exfor_indexes.c.entry_id == exfor_reactions.c.entry_id)
+            .join(ranges, ranges.c.entry_id == exfor_reactions.c.entry_id)
         )
-        .group_by(exfor_reactions.c.entry_id)
-        .order_by(exfor_bib.c.year.desc())
+        .where(*where, *_grid_after(exfor_reactions.c.entry_id, after))
+        .order_by(*_grid_order(by_name, sort))
     )
+    if ranges is exfor_indexes:
+        stmt = stmt.group_by(exfor_reactions.c.entry_id)
+    else:
+        # plain columns of the summary, filtered before the join
+        stmt = stmt.where(*having)
+        having = []
+    if having:
+        stmt = stmt.having(and_(*having))
+    if page_size:
+        stmt = stmt.limit(page_size).offset(offset or None)
 
     with engines["exfor"].connect() as connection:
-        df = pd.read_sql(
-            sql=stmt,
-            con=connection,
-        )
+        df = read_sql(stmt, connection)
 
     return df
 
 
-def join_index_bib():
-    all = (
-        select(
-            exfor_indexes.c.entry_id,
-            exfor_indexes.c.target,
-            exfor_indexes.c.process,
-            exfor_indexes.c.residual,
-            exfor_indexes.c.en_inc_min,
-            exfor_indexes.c.en_inc_max,
-            exfor_indexes.c.sf5,
-            exfor_indexes.c.sf6,
-            exfor_indexes.c.sf7,
-            exfor_indexes.c.sf8,
-            exfor_bib.c.entry,
-            exfor_bib.c.authors,
-            exfor_bib.c.year,
-            exfor_bib.c.main_facility_institute,
-            exfor_bib.c.main_facility_type,
+def iter_join_reaction_bib(chunk_size=GRID_CHUNK_SIZE, sort=None, filters=None):
+    """Generator over join_reaction_bib in DataFrame chunks of chunk_size rows."""
+    yield from _iter_grid(join_reaction_bib, chunk_size, sort, filters)
+
+
+@instrumented
+def join_index_bib(page_size=None, after=None, offset=None, sort=None, filters=None):
+    """
+    Rows of exfor_indexes joined with exfor_bib, ordered by year desc, entry_id.
+    Arguments as in join_reaction_bib. With the default order a page holds
+    page_size entry_ids, so all index rows of an entry_id stay on one page.
+    """
+    columns = [
+        exfor_indexes.c.entry_id,
+        exfor_indexes.c.target,
+        exfor_indexes.c.process,
+        exfor_indexes.c.residual,
+        exfor_indexes.c.en_inc_min,
+        exfor_indexes.c.en_inc_max,
+        exfor_indexes.c.sf5,
+        exfor_indexes.c.sf6,
+        exfor_indexes.c.sf7,
+        exfor_indexes.c.sf8,
+        exfor_bib.c.entry,
+        exfor_bib.c.authors,
+        exfor_bib.c.year,
+        exfor_bib.c.main_facility_institute,
+        exfor_bib.c.main_facility_type,
+    ]
+    by_name = {col.name: col for col in columns}
+    where, having = _grid_filters(by_name, filters)
+    where += having  # no aggregates here
+
+    if after is not None and sort:
+        raise ValueError("Keyset pagination (after) requires the default order")
+
+    joined = exfor_indexes.join(exfor_bib, exfor_bib.c.entry == exfor_indexes.c.entry)
+
+    if page_size and not sort:
+        page_ids = (
+            select(exfor_indexes.c.entry_id)
+            .select_from(joined)
+            .where(*where, *_grid_after(exfor_indexes.c.entry_id, after))
+            .group_by(exfor_indexes.c.entry_id)
+            .order_by(*_grid_order(by_name, None))
+            .limit(page_size)
         )
-        .join(exfor_bib, exfor_bib.c.entry == exfor_indexes.c.entry)
-        .order_by(exfor_bib.c.year.desc())
+        where.append(exfor_indexes.c.entry_id.in_(page_ids))
+
+    all = (
+        select(*columns)
+        .select_from(joined)
+        .where(*where)
+        .order_by(*_grid_order(by_name, sort))
     )
+    if page_size and sort:
+        all = all.limit(page_size).offset(offset or None)
 
     with engines["exfor"].connect() as connection:
-        df = pd.read_sql(
-            sql=all,
-            con=connection,
-        )
+        df = read_sql(all, connection)
 
     return df
+
+
+def iter_join_index_bib(chunk_size=GRID_CHUNK_SIZE, sort=None, filters=None):
+    """Generator over join_index_bib in DataFrame chunks, see _iter_grid."""
+    yield from _iter_grid(join_index_bib, chunk_size, sort, filters)
+
+
+########  -------------------------------------- ##########
+##         Asyncio counterparts
+##   (the blocking queries above run on the bounded
+##    executor of utilities/aio.py)
+########  -------------------------------------- ##########
+
+async def exfor_index_query_async(input_store) -> dict:
+    return await run_query(exfor_index_query, input_store)
+
+
+async def data_query_async(input_store, entids, **kwargs):
+    return await run_query(data_query, input_store, entids, **kwargs)
+
+
+async def entries_query_async(**kwargs):
+    return await run_query(entries_query, **kwargs)
@@ -0,0 +1,163 @@
+####################################################################
+#
+# The *_async query functions against their blocking counterparts on
+# small synthetic SQLite databases (see benchmarks/synthetic.py).
+#
+# Run from the application root, where config.py and the exforparser /
+# endftables_sql models are importable:
+#
+#    python -m pytest submodules/tests
+#
+####################################################################
+
+import os
+import sys
+import asyncio
+import importlib
+import threading
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event
+
+# the package is imported under the directory name the application gives it
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(ROOT)
+sys.path.insert(0, os.path.dirname(ROOT))
+
+try:
+    exfor_queries = importlib.import_module(f"{PACKAGE}.exfor.queries")
+    lib_queries = importlib.import_module(f"{PACKAGE}.endflibs.queries")
+    synthetic = importlib.import_module(f"{PACKAGE}.benchmarks.synthetic")
+except Exception as error:
+    # no config.py / models next to the package, e.g. a bare checkout
+    pytest.skip(f"application modules not importable: {error}", allow_module_level=True)
+
+
+XS = {
+    "obs_type": "XS",
+    "reaction": "n,g",
+    "target_elem": "U",
+    "target_mass": "235",
+    "inc_pt": "n",
+    "mt": "102",
+}
+MACS = {"target_elem": "U", "target_mass": "235", "obs_type": "macs"}
+
+
+@pytest.fixture(scope="module")
+def engines(tmp_path_factory):
+    """Point config.engines at fresh synthetic databases for the module."""
+    paths = synthetic.build(str(tmp_path_factory.mktemp("db")), 20_000, 20_000)
+    saved = dict(exfor_queries.engines)
+    use_lookup_cache = lib_queries.USE_LOOKUP_CACHE
+
+    engines = {name: create_engine(f"sqlite:///{path}") for name, path in paths.items()}
+    for name, engine in engines.items():
+        exfor_queries.engines[name] = engine
+        lib_queries.engines[name] = engine
+    # every call must reach the database
+    lib_queries.USE_LOOKUP_CACHE = False
+
+    yield engines
+
+    lib_queries.USE_LOOKUP_CACHE = use_lookup_cache
+    for name, engine in engines.items():
+        exfor_queries.engines[name] = saved[name]
+        lib_queries.engines[name] = saved[name]
+        engine.dispose()
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_exfor_index_query_async(engines):
+    assert _run(exfor_queries.exfor_index_query_async(XS)) == exfor_queries.exfor_index_query(XS)
+
+
+def test_data_query_async(engines):
+    entids = list(exfor_queries.exfor_index_query(XS))
+    assert entids
+    for kwargs in ({}, {"stream": True}, {"max_points": 50}, {"compact": True}):
+        pd.testing.assert_frame_equal(
+            _run(exfor_queries.data_query_async(XS, entids, **kwargs)),
+            exfor_queries.data_query(XS, entids, **kwargs),
+        )
+
+
+def test_entries_query_async(engines):
+    pd.testing.assert_frame_equal(
+        _run(exfor_queries.entries_query_async(target_elem="U", target_mass="235")),
+        exfor_queries.entries_query(target_elem="U", target_mass="235"),
+    )
+
+
+def test_lib_index_query_async(engines):
+    assert _run(lib_queries.lib_index_query_async(XS)) == lib_queries.lib_index_query(XS)
+
+
+def test_lib_data_query_async(engines):
+    ids = list(lib_queries.lib_index_query(XS))
+    assert ids
+    pd.testing.assert_frame_equal(
+        _run(lib_queries.lib_data_query_async(XS, ids)),
+        lib_queries.lib_data_query(XS, ids),
+    )
+
+
+def test_resonancetable_index_query_async(engines):
+    pd.testing.assert_frame_equal(
+        _run(lib_queries.resonancetable_index_query_async(MACS)),
+        lib_queries.resonancetable_index_query(MACS),
+    )
+
+
+def test_concurrent_calls_use_separate_connections(engines):
+    lock = threading.Lock()
+    checked_out, threads, shared = set(), set(), []
+
+    def on_checkout(dbapi_connection, record, proxy):
+        with lock:
+            if id(dbapi_connection) in checked_out:
+                shared.append(dbapi_connection)
+            checked_out.add(id(dbapi_connection))
+            threads.add(threading.get_ident())
+
+    def on_checkin(dbapi_connection, record):
+        with lock:
+            checked_out.discard(id(dbapi_connection))
+
+    for engine in engines.values():
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "checkin", on_checkin)
+
+    entids = list(exfor_queries.exfor_index_query(XS))
+    ids = list(lib_queries.lib_index_query(XS))
+
+    async def many():
+        calls = []
+        for _ in range(8):
+            calls += [
+                exfor_queries.data_query_async(XS, entids),
+                lib_queries.lib_data_query_async(XS, ids),
+                lib_queries.resonancetable_index_query_async(MACS),
+            ]
+        return await asyncio.gather(*calls)
+
+    try:
+        results = _run(many())
+    finally:
+        for engine in engines.values():
+            event.remove(engine, "checkout", on_checkout)
+            event.remove(engine, "checkin", on_checkin)
+
+    assert not shared
+    assert len(threads) > 1
+    expected = [
+        exfor_queries.data_query(XS, entids),
+        lib_queries.lib_data_query(XS, ids),
+        lib_queries.resonancetable_index_query(MACS),
+    ]
+    for i, result in enumerate(results):
+        pd.testing.assert_frame_equal(result, expected[i % 3])
@@ -0,0 +1,55 @@
+####################################################################
+#
+# This file is part of exfor-parser.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Disclaimer: The code is still under developments and not ready
+#             to use. It has been made public to share the progress
+#             among collaborators.
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import os
+import asyncio
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Maximum number of blocking queries run at the same time by run_query
+QUERY_EXECUTOR_WORKERS = int(os.environ.get("QUERY_EXECUTOR_WORKERS", 8))
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Bounded thread pool shared by all async query functions, created on first use."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=QUERY_EXECUTOR_WORKERS, thread_name_prefix="query"
+                )
+    return _executor
+
+
+def set_executor(executor):
+    """Use another executor, e.g. one sized to the connection pools of the engines."""
+    global _executor
+    with _lock:
+        _executor = executor
+
+
+async def run_query(func, *args, **kwargs):
+    """
+    Await a blocking query function on the bounded executor, so that an async
+    server can run experimental and evaluated data queries concurrently.
+    Context variables of the caller are visible inside func.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
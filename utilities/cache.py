@@ -0,0 +1,355 @@
+####################################################################
+#
+# This file is part of exfor-parser.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Disclaimer: The code is still under developments and not ready
+#             to use. It has been made public to share the progress
+#             among collaborators.
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import os
+import glob
+import time
+import pickle
+import hashlib
+import threading
+import tempfile
+import pandas as pd
+from collections import OrderedDict
+
+try:
+    import pyarrow  # noqa: F401
+
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used mapping, bounded by the number of entries
+    and/or by the total size of the values as measured by sizeof(value).
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._sizes.pop(key)
+                del self._data[key]
+
+            if self.max_bytes is not None and size > self.max_bytes:
+                # never fits, do not flush the whole cache for it
+                return
+
+            self._data[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+
+            while self._data and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                old, _ = self._data.popitem(last=False)
+                self._bytes -= self._sizes.pop(old)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._bytes -= self._sizes.pop(key)
+            return self._data.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def frame_nbytes(df) -> int:
+    """Memory footprint of a DataFrame including the contents of object columns."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def frame_file_suffix() -> str:
+    return ".parquet" if HAS_PARQUET else ".pkl"
+
+
+def write_frame(df, path):
+    """
+    Write df atomically to path, as parquet when pyarrow is available and as a
+    pickle otherwise (see frame_file_suffix).
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        if HAS_PARQUET:
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_pickle(tmp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_frame(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def write_object(obj, path):
+    """Pickle obj atomically to path, for values other than DataFrames."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_object(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def copy_value(value):
+    """Shallow copy of a cached DataFrame, dict or list, other values as they are."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, (dict, list)):
+        return type(value)(value)
+    return value
+
+
+_MISSING = object()
+
+
+class FingerprintCache:
+    """
+    LRUCache of values computed from a source that rarely changes, such as
+    a database or a library release. Every value is stored with the
+    fingerprint of its source (see utilities.db.db_fingerprint) and is
+    recomputed once the fingerprint differs.
+
+    With shared_dir the values are also written to disk, one file per
+    (key, fingerprint), so that other processes reuse them. The files are
+    written atomically and best effort: on failure, e.g. a read-only file
+    system, the value is only kept in memory. shared_max_files and
+    shared_max_bytes bound the directory: the files least recently written
+    or read are removed first. The files are unpickled, so shared_dir must
+    only be writable by the trusted processes sharing the cache.
+
+    Values are handed out as shallow copies (copy_value); do not modify
+    DataFrame values in place.
+    """
+
+    # Seconds a file of an outdated fingerprint is kept in shared_dir. It
+    # must exceed the fingerprint check interval of every process, so that
+    # no process still reads or writes the files of that fingerprint.
+    SHARED_GRACE = 300.0
+
+    # shared_dir is checked against its bounds every this many writes
+    SHARED_PRUNE_EVERY = 64
+
+    def __init__(
+        self,
+        max_entries=None,
+        max_bytes=None,
+        sizeof=None,
+        shared_dir=None,
+        shared_max_files=None,
+        shared_max_bytes=None,
+    ):
+        self.shared_dir = shared_dir
+        self.shared_max_files = shared_max_files
+        self.shared_max_bytes = shared_max_bytes
+        self._writes = 0
+        self._lru = LRUCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            sizeof=(lambda item: sizeof(item[1])) if sizeof else None,
+        )
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, fingerprint, compute, label=""):
+        """
+        The value of key for fingerprint: from memory, then shared_dir, then
+        compute(). label groups the statistics and prefixes the file names.
+        """
+        cached = self._lru.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            self._count(label, "hits")
+            return copy_value(cached[1])
+
+        value = self._read_shared(label, key, fingerprint) if self.shared_dir else _MISSING
+        if value is not _MISSING:
+            self._count(label, "shared_hits")
+        else:
+            self._count(label, "misses")
+            value = compute()
+            if self.shared_dir:
+                self._write_shared(label, key, fingerprint, value)
+
+        self._lru.put(key, (fingerprint, value))
+        return copy_value(value)
+
+    def _count(self, label, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(label, {"hits": 0, "shared_hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def _prefix(self, label, key) -> str:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:24]
+        return os.path.join(self.shared_dir, f"{label}-{digest}" if label else digest)
+
+    def _stem(self, label, key, fingerprint) -> str:
+        release = hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:16]
+        return f"{self._prefix(label, key)}-{release}"
+
+    def _read_shared(self, label, key, fingerprint):
+        stem = self._stem(label, key, fingerprint)
+        for suffix, read in ((frame_file_suffix(), read_frame), (".pickle", read_object)):
+            if os.path.exists(stem + suffix):
+                try:
+                    value = read(stem + suffix)
+                    # recently read files are pruned last
+                    os.utime(stem + suffix)
+                    return value
+                except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+                    # removed meanwhile, or unreadable: compute it again
+                    return _MISSING
+        return _MISSING
+
+    def _write_shared(self, label, key, fingerprint, value):
+        stem = self._stem(label, key, fingerprint)
+        try:
+            if isinstance(value, pd.DataFrame):
+                path = stem + frame_file_suffix()
+                write_frame(value, path)
+            else:
+                path = stem + ".pickle"
+                write_object(value, path)
+        except OSError:
+            return
+
+        # files of other fingerprints of this key, once no process uses them
+        expired = time.time() - self.SHARED_GRACE
+        for stale in glob.glob(glob.escape(self._prefix(label, key)) + "-*"):
+            try:
+                if stale != path and not stale.endswith(".tmp") and os.path.getmtime(stale) < expired:
+                    os.remove(stale)
+            except OSError:
+                pass
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.SHARED_PRUNE_EVERY == 1
+        if prune:
+            self._prune_shared()
+
+    def _prune_shared(self):
+        """Remove the least recently used files until shared_dir is within its bounds."""
+        if self.shared_max_files is None and self.shared_max_bytes is None:
+            return
+
+        files = []
+        try:
+            with os.scandir(self.shared_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".tmp"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+
+        files.sort()
+        count, total = len(files), sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if (self.shared_max_files is None or count <= self.shared_max_files) and (
+                self.shared_max_bytes is None or total <= self.shared_max_bytes
+            ):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            # removed here or by another process
+            count -= 1
+            total -= size
+
+    def stats(self) -> dict:
+        """Entries, bytes and evictions in memory; hits, shared_hits and misses in total and per label."""
+        with self._lock:
+            labels = {label: dict(counts) for label, counts in self._counts.items()}
+        memory = self._lru.stats()
+        totals = {
+            outcome: sum(counts[outcome] for counts in labels.values())
+            for outcome in ("hits", "shared_hits", "misses")
+        }
+        return {
+            "entries": memory["entries"],
+            "bytes": memory["bytes"],
+            "evictions": memory["evictions"],
+            **totals,
+            "labels": labels,
+        }
+
+    def clear(self):
+        """Empty the memory tier and the statistics; shared_dir is kept."""
+        self._lru.clear()
+        with self._lock:
+            self._counts.clear()
@@ -0,0 +1,313 @@
+####################################################################
+#
+# This file is part of exfor-parser.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Disclaimer: The code is still under developments and not ready
+#             to use. It has been made public to share the progress
+#             among collaborators.
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import os
+import time
+from sqlalchemy import create_engine, event, select, func, and_, or_, bindparam
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import (
+    BinaryExpression,
+    BindParameter,
+    BooleanClauseList,
+    ColumnClause,
+    False_,
+    Null,
+    True_,
+)
+
+from .cache import LRUCache
+
+
+# Seconds a fingerprint is reused by the caches built on db_fingerprint
+# before it is computed again (the max_age they pass)
+FINGERPRINT_MAX_AGE = 10.0
+
+# (engine url, table name) -> (checked at, fingerprint), see db_fingerprint(max_age=...)
+_fingerprints = {}
+
+
+def sqlite_file(engine):
+    """Path of the database file behind a file-based SQLite engine, else None."""
+    url = engine.url
+    if url.get_backend_name() != "sqlite":
+        return None
+    database = url.database
+    if database and database.startswith("file:"):
+        # sqlite:///file:path?mode=ro&uri=true, see create_readonly_engine
+        database = database[len("file:") :].split("?", 1)[0]
+    if not database or database == ":memory:":
+        return None
+    return database if os.path.exists(database) else None
+
+
+def db_fingerprint(engine, table=None, max_age=0.0):
+    """
+    Cheap fingerprint of the database behind engine, used to invalidate
+    in-process caches when the database changes.
+
+    File-based SQLite: (path, mtime_ns, size) of the database file.
+    Other backends: row count and max primary key of table.
+    With max_age > 0 a fingerprint computed less than max_age seconds ago is reused.
+    """
+    key = (str(engine.url), getattr(table, "name", None))
+    now = time.monotonic()
+    if max_age > 0 and key in _fingerprints:
+        checked_at, fingerprint = _fingerprints[key]
+        if now - checked_at < max_age:
+            return fingerprint
+
+    fingerprint = _fingerprint(engine, table)
+    _fingerprints[key] = (now, fingerprint)
+    return fingerprint
+
+
+def _fingerprint(engine, table):
+    path = sqlite_file(engine)
+    if path:
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    if table is None:
+        return None
+
+    pk = list(table.primary_key)
+    columns = [func.count()] + ([func.max(pk[0])] if pk else [])
+    with engine.connect() as conn:
+        row = conn.execute(select(*columns).select_from(table)).one()
+
+    return (table.name, *row)
+
+
+######## -------------------------------------- ########
+#    Compiled statement cache
+#
+#    The obs_type query builders produce a list of conditions whose
+#    structure (columns, operators, number of IN values) depends only on
+#    which options are set, not on their values. execute_cached keys the
+#    compiled SQL on that structure: the first call of a shape rebuilds
+#    the conditions with named bind parameters, compiles the statement
+#    once, and later calls only extract the values and hand them to the
+#    DBAPI cursor.
+######## -------------------------------------- ########
+
+# Number of distinct (dialect, statement, shape) entries kept
+STATEMENT_CACHE_SIZE = 512
+
+_statements = LRUCache(max_entries=STATEMENT_CACHE_SIZE)
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+def _shape(cond, shape: list, values: list):
+    """Append the structure of cond to shape and its bound values to values."""
+    if isinstance(cond, BooleanClauseList):
+        shape.append(("(", cond.operator))
+        for clause in cond.clauses:
+            _shape(clause, shape, values)
+        shape.append((")",))
+        return
+
+    if not isinstance(cond, BinaryExpression) or not isinstance(cond.left, ColumnClause):
+        raise _Uncacheable(type(cond).__name__)
+
+    left = (getattr(cond.left.table, "name", None), cond.left.key)
+    modifiers = tuple(sorted(cond.modifiers.items()))
+    right = cond.right
+
+    if isinstance(right, BindParameter):
+        value = right.effective_value
+        if right.expanding:
+            value = list(value)
+            shape.append((left, cond.operator, modifiers, "in", len(value)))
+            values.extend(value)
+        else:
+            shape.append((left, cond.operator, modifiers, "bind"))
+            values.append(value)
+    elif isinstance(right, (Null, False_, True_)):
+        shape.append((left, cond.operator, modifiers, type(right).__name__))
+    else:
+        raise _Uncacheable(type(right).__name__)
+
+
+def _parameterise(cond, names):
+    """Copy of cond with every bound value replaced by the next named bindparam."""
+    if isinstance(cond, BooleanClauseList):
+        join = and_ if cond.operator is operators.and_ else or_
+        return join(*[_parameterise(clause, names) for clause in cond.clauses])
+
+    right = cond.right
+    if not isinstance(right, BindParameter):
+        return cond
+
+    if right.expanding:
+        params = [
+            bindparam(next(names), type_=right.type)
+            for _ in right.effective_value
+        ]
+        if cond.operator is operators.not_in_op:
+            return cond.left.not_in(params)
+        return cond.left.in_(params)
+
+    return BinaryExpression(
+        cond.left,
+        bindparam(next(names), type_=right.type),
+        cond.operator,
+        negate=cond.negate,
+        modifiers=cond.modifiers,
+        type_=cond.type,
+    )
+
+
+def execute_cached(conn, name: str, build, conditions: list) -> list:
+    """
+    Run build(conditions) on conn through the compiled statement cache.
+
+    name       : identifies the statement builder, part of the cache key
+    build      : callable(conditions) -> Select, called once per shape
+    conditions : list of conditions from the obs_type builders
+
+    Returns the rows (attribute access by column label). Conditions that
+    cannot be parameterised are executed the ordinary way.
+    """
+    shape, values = [], []
+    try:
+        for cond in conditions:
+            _shape(cond, shape, values)
+    except _Uncacheable:
+        return conn.execute(build(conditions)).fetchall()
+
+    dialect = conn.dialect
+    key = (dialect.name, dialect.driver, name, tuple(shape))
+    cached = _statements.get(key)
+    if cached is None:
+        names = (f"p{i}" for i in range(len(values)))
+        stmt = build([_parameterise(cond, names) for cond in conditions])
+        compiled = stmt.compile(dialect=dialect)
+        order = compiled.positiontup if compiled.positional else None
+        cached = (str(compiled), order)
+        _statements.put(key, cached)
+
+    sql, order = cached
+    params = {f"p{i}": value for i, value in enumerate(values)}
+    if order is not None:
+        params = tuple(params[p] for p in order)
+
+    return conn.exec_driver_sql(sql, params).fetchall()
+
+
+def statement_cache_stats() -> dict:
+    return _statements.stats()
+
+
+######## -------------------------------------- ########
+#    Read-only engine profile
+#
+#    For deployments serving the databases read-only: the SQLite file is
+#    opened with mode=ro, a pool of connections is kept open, and every
+#    connection gets a large mmap window and page cache. warm_up() fills
+#    the pool and the caches at startup so that the first requests do not
+#    pay for them.
+#
+#    immutable=1 additionally skips locking and change detection. Only opt
+#    in (per engine, in READONLY_PROFILES or as an override) for a file that
+#    is never replaced in place while the process runs: SQLite would keep
+#    serving stale pages of a replaced file, and the db_fingerprint based
+#    caches rely on picking such updates up.
+######## -------------------------------------- ########
+
+READONLY_PROFILE = {
+    "pool_size": 8,
+    "max_overflow": 8,
+    "immutable": False,
+    "mmap_size": 2 * 1024**3,  # bytes
+    "cache_size": -256 * 1024,  # negative: KiB per connection
+    "temp_store": "MEMORY",
+    # tables read by warm_up() on every pooled connection
+    "warm_tables": (),
+}
+
+# Per-engine overrides of READONLY_PROFILE, keyed like config.engines
+READONLY_PROFILES = {
+    "exfor": {"warm_tables": ("exfor_indexes", "exfor_reactions", "exfor_bib")},
+    "endftables": {"warm_tables": ("endf_reactions", "resonancetable_data")},
+}
+
+
+def readonly_profile(name=None, **overrides) -> dict:
+    """READONLY_PROFILE updated with READONLY_PROFILES[name] and overrides."""
+    return {**READONLY_PROFILE, **READONLY_PROFILES.get(name, {}), **overrides}
+
+
+def create_readonly_engine(path, name=None, **overrides):
+    """
+    Engine for a SQLite database file opened read-only with the profile of
+    name ("exfor", "endftables"); see readonly_profile for the settings.
+    """
+    profile = readonly_profile(name, **overrides)
+    query = "mode=ro&immutable=1" if profile["immutable"] else "mode=ro"
+    engine = create_engine(
+        f"sqlite:///file:{os.path.abspath(path)}?{query}&uri=true",
+        pool_size=profile["pool_size"],
+        max_overflow=profile["max_overflow"],
+        # LIFO hands out the most recently used connection, whose page cache is hot
+        pool_use_lifo=True,
+    )
+    engine.readonly_profile = profile
+
+    pragmas = (
+        f"PRAGMA mmap_size = {int(profile['mmap_size'])}",
+        f"PRAGMA cache_size = {int(profile['cache_size'])}",
+        f"PRAGMA temp_store = {profile['temp_store']}",
+        "PRAGMA query_only = 1",
+    )
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
+
+
+def warm_up(engine, connections=None, tables=None, read_file=True):
+    """
+    Open connections (default: the pool size) at the same time so that the
+    pool is full, read tables on each of them to fill its page cache, and
+    read the database file once so that it is in the OS page cache.
+    """
+    profile = getattr(engine, "readonly_profile", {})
+    if connections is None:
+        connections = profile.get("pool_size", 1)
+    if tables is None:
+        tables = profile.get("warm_tables", ())
+
+    path = sqlite_file(engine)
+    if read_file and path:
+        with open(path, "rb") as f:
+            while f.read(16 * 1024**2):
+                pass
+
+    opened = []
+    try:
+        for _ in range(max(connections, 1)):
+            conn = engine.connect()
+            opened.append(conn)
+            for table in tables:
+                # count(*) walks the table b-tree (or its smallest index)
+                conn.exec_driver_sql(f"SELECT count(*) FROM {table}").fetchall()
+    finally:
+        for conn in opened:
+            conn.close()
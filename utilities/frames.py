@@ -0,0 +1,160 @@
+####################################################################
+#
+# This file is part of exfor-parser.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Disclaimer: The code is still under developments and not ready
+#             to use. It has been made public to share the progress
+#             among collaborators.
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import numpy as np
+import pandas as pd
+
+
+def _sort_within(values, keys):
+    """Permutation sorting by integer keys, then by values inside each key."""
+    order = np.argsort(values, kind="quicksort")
+    return order[np.argsort(keys[order], kind="stable")]
+
+
+def downsample_minmax(df, x, y, by, max_points):
+    """
+    Reduce every series of df (rows sharing the columns in by) to at most
+    about max_points rows while keeping its shape: the series is sorted by x,
+    cut into bins of equal point count, and the rows holding the minimum and
+    the maximum of y in each bin are kept, plus the first and last points.
+    Whole rows are kept, so error bars and other columns follow the points.
+    Series with at most max_points rows are returned unchanged.
+
+    The selection is a few vectorised numpy passes over all series at once.
+    Returns a subset of df in the original row order.
+    """
+    n = len(df)
+    if n == 0 or not max_points or n <= max_points:
+        return df
+
+    group = df.groupby(by, sort=False, dropna=False).ngroup().to_numpy()
+    counts = np.bincount(group)
+    if counts.max() <= max_points:
+        return df
+
+    xs = df[x].to_numpy(dtype=float)
+    ys = df[y].to_numpy(dtype=float)
+
+    # rows sorted by (series, x), rank of each row inside its series;
+    # a float argsort followed by a stable (radix) sort on the integer key
+    order = _sort_within(xs, group)
+    g_sorted = group[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(n) - starts[g_sorted]
+    size = counts[g_sorted]
+
+    # two points (min, max) per bin, first and last point kept separately
+    nbins = np.maximum((max_points - 2) // 2, 1)
+    bins = rank * nbins // size
+
+    keep = np.zeros(n, dtype=bool)
+    small = size <= max_points
+    keep[order[small]] = True
+    keep[order[rank == 0]] = True
+    keep[order[rank == size - 1]] = True
+
+    # min and max of y per (series, bin): sort by y inside each bin, take both ends
+    large = order[~small]
+    if len(large):
+        bin_key = g_sorted[~small].astype(np.int64) * (nbins + 1) + bins[~small]
+        by_y = _sort_within(ys[large], bin_key)
+        key_sorted = bin_key[by_y]
+        first = np.r_[True, key_sorted[1:] != key_sorted[:-1]]
+        last = np.r_[key_sorted[1:] != key_sorted[:-1], True]
+        keep[large[by_y[first]]] = True
+        keep[large[by_y[last]]] = True
+
+    return df[keep]
+
+
+######## -------------------------------------- ########
+#    Compact dtypes for query results
+######## -------------------------------------- ########
+
+# Float columns kept in float64 by compact_frame: energies need more than
+# the ~7 significant digits of float32 in the resolved resonance region
+COMPACT_KEEP_FLOAT64 = ("en_inc", "den_inc", "e_out", "de_out")
+
+# Columns stored as nullable integers when all their values are integral
+COMPACT_INT_COLUMNS = ("level_num", "charge", "mass", "isomer")
+
+# String columns become categorical when at most this fraction of values is unique
+COMPACT_CATEGORY_RATIO = 0.5
+
+
+def _small_int_dtype(values):
+    """Smallest nullable integer dtype holding values (non-null, integral floats)."""
+    low, high = values.min(), values.max()
+    for dtype in ("Int8", "Int16", "Int32"):
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return dtype
+    return "Int64"
+
+
+def _compact_column(col, name, keep_float64):
+    if len(col) and col.isna().all():
+        # e.g. de_out or residual in most results; keep it usable as numbers
+        return col if col.dtype == np.float64 else col.astype(np.float64)
+
+    if name in COMPACT_INT_COLUMNS:
+        numeric = pd.to_numeric(col, errors="coerce")
+        present = numeric.dropna().to_numpy(dtype=float)
+        if numeric.isna().sum() == col.isna().sum() and np.array_equal(present, np.round(present)):
+            if not len(present):
+                return numeric.astype("Int8")
+            return numeric.astype(_small_int_dtype(present))
+
+    if pd.api.types.is_float_dtype(col.dtype):
+        if name in keep_float64 or col.dtype == np.float32:
+            return col
+        values = np.abs(col.to_numpy())
+        nonzero = values[np.isfinite(values) & (values > 0)]
+        info = np.finfo(np.float32)
+        # out of range, or subnormal / flushed to zero in float32
+        if len(nonzero) and (nonzero.max() > info.max or nonzero.min() < info.tiny):
+            return col
+        return col.astype(np.float32)
+
+    if pd.api.types.is_integer_dtype(col.dtype) and not isinstance(col.dtype, pd.api.extensions.ExtensionDtype):
+        return pd.to_numeric(col, downcast="integer")
+
+    if col.dtype == object or pd.api.types.is_string_dtype(col.dtype):
+        if len(col) and col.nunique(dropna=True) <= COMPACT_CATEGORY_RATIO * len(col):
+            return col.astype("category")
+
+    return col
+
+
+def compact_frame(df, keep_float64=COMPACT_KEEP_FLOAT64):
+    """
+    Copy of df with smaller dtypes for memory-bound callers:
+    - float64 becomes float32, except the columns in keep_float64 and
+      columns with values outside the normal float32 range
+    - columns without any value stay (or become) float64 NaN
+    - level_num, charge, mass and isomer become nullable Int8/Int16 when integral
+    - other integers are downcast
+    - repeated strings (entry_id, residual, evaluation, ...) become categorical
+
+    df.attrs["nbytes"] and df.attrs["bytes_saved"] give the footprint of the
+    result and the bytes saved compared with df.
+    """
+    before = int(df.memory_usage(index=True, deep=True).sum())
+    out = pd.DataFrame(
+        {name: _compact_column(df[name], name, keep_float64) for name in df.columns},
+        index=df.index,
+    )
+    out.attrs.update(df.attrs)
+    after = int(out.memory_usage(index=True, deep=True).sum())
+    out.attrs["nbytes"] = after
+    out.attrs["bytes_saved"] = before - after
+    return out
@@ -0,0 +1,358 @@
+####################################################################
+#
+# This file is part of exfor-parser.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Disclaimer: The code is still under developments and not ready
+#             to use. It has been made public to share the progress
+#             among collaborators.
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import os
+import json
+import bisect
+import math
+import time
+import functools
+import threading
+import contextvars
+import pandas as pd
+from sqlalchemy import event, text
+
+
+######## -------------------------------------- ########
+#    Query instrumentation
+#
+#    @instrumented wraps the query functions of exfor/queries.py and
+#    endflibs/queries.py. For each call it records the wall time, the
+#    time spent in cursor.execute (DB time, measured by engine events)
+#    and fetching rows (db_timer blocks), the time spent building
+#    DataFrames (frame_timer blocks), the number
+#    of rows returned and the obs_type / target labels of input_store.
+#    Records go to in-process histograms, exported by prometheus_text()
+#    and metrics_json(), and to the registered callbacks.
+#
+#    Disabled (the default) a wrapped call costs one global lookup.
+######## -------------------------------------- ########
+
+# Set QUERY_INSTRUMENTATION=1 or call enable() to start recording
+ENABLED = os.environ.get("QUERY_INSTRUMENTATION", "0") == "1"
+
+# Label the metrics with the target nuclide as well as the obs_type
+# (one series per target, switch off if that is too many for the scraper)
+TARGET_LABEL = True
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+_METRICS = (
+    ("query_wall_seconds", "Wall time of the query function", "wall", TIME_BUCKETS),
+    ("query_db_seconds", "Time spent executing statements and fetching rows", "db", TIME_BUCKETS),
+    ("query_frame_seconds", "Time spent building DataFrames", "frame", TIME_BUCKETS),
+    ("query_rows", "Rows returned by the query function", "rows", ROW_BUCKETS),
+)
+_LABELS = ("function", "obs_type", "target")
+
+# record of the innermost instrumented call running in this context
+_current = contextvars.ContextVar("query_record", default=None)
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def disable():
+    enable(False)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense, one per label set."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """[(upper bound, cumulative count)], the last bound being +Inf."""
+        total, out = 0, []
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+
+_histograms = {}  # (metric, labels) -> Histogram
+_errors = {}  # labels -> count
+_callbacks = []
+_lock = threading.Lock()
+
+
+def add_callback(callback):
+    """
+    Call callback(record) after every instrumented call, e.g. to forward
+    it to a tracer. record is a dict with function, obs_type, target,
+    wall, db, frame, rows, start (epoch seconds) and error (exception or None).
+    Exceptions raised by callbacks are ignored.
+    """
+    with _lock:
+        if callback not in _callbacks:
+            _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    with _lock:
+        if callback in _callbacks:
+            _callbacks.remove(callback)
+
+
+def reset():
+    """Drop all recorded histograms and error counts."""
+    with _lock:
+        _histograms.clear()
+        _errors.clear()
+
+
+######## -------------------------------------- ########
+#    Recording
+######## -------------------------------------- ########
+
+
+def _labels(args, kwargs) -> tuple:
+    input_store = kwargs.get("input_store")
+    if input_store is None and args and isinstance(args[0], dict):
+        input_store = args[0]
+    if not isinstance(input_store, dict):
+        return "", ""
+
+    obs_type = str(input_store.get("obs_type") or "").upper()
+    target = ""
+    if TARGET_LABEL and input_store.get("target_elem"):
+        target = f"{input_store['target_elem']}-{input_store.get('target_mass') or ''}"
+    return obs_type, target
+
+
+def _rows(result):
+    if isinstance(result, tuple) and result:
+        # (entries, df) style results: count the rows of the frame
+        result = result[-1]
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def _observe(record):
+    labels = (record["function"], record["obs_type"], record["target"])
+    with _lock:
+        for metric, _, field, buckets in _METRICS:
+            value = record[field]
+            if value is None:
+                continue
+            hist = _histograms.get((metric, labels))
+            if hist is None:
+                hist = _histograms[(metric, labels)] = Histogram(buckets)
+            hist.observe(value)
+        if record["error"] is not None:
+            _errors[labels] = _errors.get(labels, 0) + 1
+        callbacks = list(_callbacks)
+
+    for callback in callbacks:
+        try:
+            callback(record)
+        except Exception:
+            pass
+
+
+def instrumented(func):
+    """
+    Record every call of func (see the module header). Nested instrumented
+    calls are recorded on their own and their DB and frame times also count
+    towards the caller.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return func(*args, **kwargs)
+
+        parent = _current.get()
+        obs_type, target = _labels(args, kwargs)
+        if not obs_type and parent is not None:
+            # helpers called with ids only take the labels of their caller
+            obs_type, target = parent["obs_type"], parent["target"]
+        record = {
+            "function": name,
+            "obs_type": obs_type,
+            "target": target,
+            "start": time.time(),
+            "wall": 0.0,
+            "db": 0.0,
+            "frame": 0.0,
+            "rows": None,
+            "error": None,
+        }
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            record["rows"] = _rows(result)
+            return result
+        except Exception as exc:
+            record["error"] = exc
+            raise
+        finally:
+            record["wall"] = time.perf_counter() - start
+            _current.reset(token)
+            if parent is not None:
+                parent["db"] += record["db"]
+                parent["frame"] += record["frame"]
+            _observe(record)
+
+    return wrapper
+
+
+class frame_timer:
+    """
+    Context manager around DataFrame construction in an instrumented call;
+    cursor.execute time inside the block is left to DB time. Fetch the rows
+    outside the block (under db_timer): SQLite steps through them while
+    they are fetched, not in cursor.execute.
+    """
+
+    __slots__ = ("record", "start", "db")
+    field = "frame"
+
+    def __enter__(self):
+        self.record = _current.get() if ENABLED else None
+        if self.record is not None:
+            self.start = time.perf_counter()
+            self.db = self.record["db"]
+        return self
+
+    def __exit__(self, *exc):
+        record = self.record
+        if record is not None:
+            elapsed = time.perf_counter() - self.start
+            record[self.field] += elapsed - (record["db"] - self.db)
+        return False
+
+
+class db_timer(frame_timer):
+    """
+    Context manager around fetching rows in an instrumented call: the whole
+    block counts as DB time, cursor.execute included.
+    """
+
+    __slots__ = ()
+    field = "db"
+
+
+def read_sql(sql, con) -> pd.DataFrame:
+    """pd.read_sql with the fetch under db_timer and only the frame under frame_timer."""
+    if isinstance(sql, str):
+        sql = text(sql)
+    with db_timer():
+        result = con.execute(sql)
+        columns = list(result.keys())
+        rows = result.fetchall()
+    with frame_timer():
+        return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record = _current.get()
+    if record is not None and conn.info.get("query_start"):
+        record["db"] += time.perf_counter() - conn.info["query_start"].pop()
+
+
+def instrument_engine(engine):
+    """Attach the DB time listeners to engine (once)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+######## -------------------------------------- ########
+#    Export
+######## -------------------------------------- ########
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(labels, extra="") -> str:
+    pairs = [f'{key}="{_escape(value)}"' for key, value in zip(_LABELS, labels)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+def prometheus_text() -> str:
+    """All histograms in the Prometheus text exposition format."""
+    with _lock:
+        items = sorted(
+            (metric, labels, hist.cumulative(), hist.sum, hist.count)
+            for (metric, labels), hist in _histograms.items()
+        )
+        errors = sorted(_errors.items())
+
+    lines = []
+    for metric, help_text, _, _ in _METRICS:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, labels, buckets, total, count in items:
+            if name != metric:
+                continue
+            for bound, cumulative in buckets:
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                bucket_labels = _label_str(labels, 'le="' + le + '"')
+                lines.append(f"{metric}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{metric}_sum{_label_str(labels)} {total}")
+            lines.append(f"{metric}_count{_label_str(labels)} {count}")
+
+    lines.append("# HELP query_errors_total Query functions that raised")
+    lines.append("# TYPE query_errors_total counter")
+    for labels, count in errors:
+        lines.append(f"query_errors_total{_label_str(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def metrics_json(indent=None) -> str:
+    """All histograms and error counts as JSON."""
+    with _lock:
+        histograms = [
+            {
+                "metric": metric,
+                **dict(zip(_LABELS, labels)),
+                "buckets": [
+                    ["+Inf" if bound == math.inf else bound, cumulative]
+                    for bound, cumulative in hist.cumulative()
+                ],
+                "sum": hist.sum,
+                "count": hist.count,
+            }
+            for (metric, labels), hist in sorted(_histograms.items(), key=lambda item: item[0])
+        ]
+        errors = [
+            {**dict(zip(_LABELS, labels)), "count": count}
+            for labels, count in sorted(_errors.items())
+        ]
+    return json.dumps({"histograms": histograms, "errors": errors}, indent=indent)